@@ -0,0 +1,282 @@
+from typing import List, Iterable, Iterator, BinaryIO, TextIO
+from rubiks_cube import CubeState, SOLVED_CUBE, get_sticker_orbits
+
+# A packed state has one sticker per byte (54 bytes). On the wire every color is stored as a 3 bit code (color - 1),
+# split into 3 bit planes of 54 bits. Each plane takes 7 bytes, bit j of byte i holding sticker 8 * i + j, so a state
+# takes 21 bytes. Keeping the bits of a sticker in the same position of every plane lets whole files be encoded, decoded
+# and validated a column at a time.
+STICKERS = 54
+PLANES = 3
+PLANE_SIZE = 7
+STATE_SIZE = PLANES * PLANE_SIZE
+
+# Header of state files, followed by STATE_SIZE bytes per state.
+MAGIC = b'RCS\x01'
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+_COLOR_TABLES = [bytes(int(value == color) for value in range(256)) for color in range(7)]
+_COLOR_TO_CODE = bytes((value - 1) & 0xff for value in range(256))
+_CODE_TO_COLOR = bytes((value + 1) & 0xff for value in range(256))
+# Bits of the last byte of each plane that do not belong to any sticker.
+_PADDING_TABLE = bytes(value >> (STICKERS % 8) for value in range(256))
+
+# Standard notation of every operation. A move followed by ' is counterclockwise and followed by 2 is a half turn.
+_NOTATION = {'U': 'up', 'D': 'down', 'B': 'back', 'F': 'front', 'L': 'left', 'R': 'right'}
+_OPERATION_NOTATION = {f"{face}_clockwise": letter for letter, face in _NOTATION.items()}
+_OPERATION_NOTATION.update({f"{face}_counterclockwise": f"{letter}'" for letter, face in _NOTATION.items()})
+
+
+_SOLVED_KEY = CubeState(SOLVED_CUBE).get_key()
+# (positions, expected number of stickers of every color) for each orbit. Every state reachable from the solved cube has
+# these counts. The rotations of RubiksCube do not keep the stickers of a corner or edge piece together, so the usual
+# piece orientation and parity rules do not hold for them, but these counts do.
+_ORBIT_COUNTS = [(orbit, [sum(1 for position in orbit if _SOLVED_KEY[position] == color) for color in range(7)])
+                 for orbit in get_sticker_orbits()]
+
+
+def _encode_chunk(keys: List[bytes]) -> bytes:
+    """
+    :return: The wire format of the packed states, one after the other.
+    """
+    count = len(keys)
+    stickers = b''.join(keys)
+    codes = [stickers[position::STICKERS].translate(_COLOR_TO_CODE) for position in range(STICKERS)]
+
+    # Each byte of the integers below belongs to one state. Shifted bits of up to 8 stickers are added together per
+    # byte, which never carries into the next state.
+    columns = []
+    for plane in range(PLANES):
+        for i in range(PLANE_SIZE):
+            value = 0
+            for j in range(min(8, STICKERS - 8 * i)):
+                value += int.from_bytes(codes[8 * i + j].translate(_BIT_TABLES[plane]), 'big') << j
+            columns.append(value.to_bytes(count, 'big'))
+
+    return b''.join(map(bytes, zip(*columns)))
+
+
+def _decode_columns(data: bytes) -> List[bytes]:
+    """
+    :return: For every sticker position, the colors of that position in all states of data.
+    """
+    count = len(data) // STATE_SIZE
+    columns = [data[offset::STATE_SIZE] for offset in range(STATE_SIZE)]
+
+    colors = []
+    for position in range(STICKERS):
+        i, j = divmod(position, 8)
+        value = 0
+        for plane in range(PLANES):
+            value += int.from_bytes(columns[plane * PLANE_SIZE + i].translate(_BIT_TABLES[j]), 'big') << plane
+        colors.append(value.to_bytes(count, 'big').translate(_CODE_TO_COLOR))
+
+    # Decoded colors of 7 and 8 already break the color counts. Padding bits have to be zero for the encoding of a
+    # state to be unique, so states that set them get an invalid color in their first sticker.
+    padding = 0
+    for plane in range(PLANES):
+        padding |= int.from_bytes(columns[plane * PLANE_SIZE + PLANE_SIZE - 1].translate(_PADDING_TABLE), 'big')
+    if padding:
+        flags = padding.to_bytes(count, 'big')
+        colors[0] = bytes(0 if flag else color for flag, color in zip(flags, colors[0]))
+
+    return colors
+
+
+def _find_invalid_columns(colors: List[bytes]) -> List[int]:
+    """
+    :param colors: For every sticker position, the colors of that position in a number of states.
+    :return: Indices of the states that cannot be reached from the solved cube.
+    """
+    if not colors[0]:
+        return []
+
+    count = len(colors[0])
+    ones = int.from_bytes(b'\x01' * count, 'big')
+
+    # Each byte of the integers below counts the stickers of a color in an orbit for one state. A state is invalid if any
+    # of its counts differs from the expected one.
+    invalid = 0
+    for orbit, expected_counts in _ORBIT_COUNTS:
+        for color in range(1, 7):
+            total = 0
+            for position in orbit:
+                total += int.from_bytes(colors[position].translate(_COLOR_TABLES[color]), 'big')
+            invalid |= total ^ (expected_counts[color] * ones)
+
+    flags = invalid.to_bytes(count, 'big')
+    return [index for index in range(count) if flags[index]]
+
+
+def find_invalid_states(keys: List[bytes]) -> List[int]:
+    """
+    Checks packed states in bulk.
+    :return: Indices of the states that are malformed or cannot be reached from the solved cube.
+    """
+    invalid = [index for index, key in enumerate(keys) if len(key) != STICKERS]
+    if invalid:
+        return invalid
+
+    stickers = b''.join(keys)
+    return _find_invalid_columns([stickers[position::STICKERS] for position in range(STICKERS)])
+
+
+def is_valid_state(key: bytes) -> bool:
+    return not find_invalid_states([key])
+
+
+def encode_state(key: bytes) -> bytes:
+    """
+    :param key: Packed state, as returned by CubeState.get_key.
+    :return: The STATE_SIZE bytes wire format of the state.
+    """
+    if not is_valid_state(key):
+        raise Exception("Invalid cube state.")
+
+    return _encode_chunk([key])
+
+
+def decode_state(data: bytes) -> bytes:
+    """
+    :return: The packed state encoded in data.
+    """
+    if len(data) != STATE_SIZE:
+        raise Exception(f"A cube state takes {STATE_SIZE} bytes. Got {len(data)}.")
+
+    colors = _decode_columns(data)
+    if _find_invalid_columns(colors):
+        raise Exception("Invalid cube state.")
+
+    return bytes(color[0] for color in colors)
+
+
+def encode_cube(cube: List) -> bytes:
+    return encode_state(CubeState(cube).get_key())
+
+
+def decode_cube(data: bytes) -> List:
+    return CubeState(None, key=decode_state(data)).get_cube()
+
+
+def write_states(file: BinaryIO, keys: Iterable[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Writes packed states to a binary file, holding at most chunk_size of them in memory at a time.
+    :return: Number of states written.
+    """
+    file.write(MAGIC)
+
+    written = 0
+    chunk = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) == chunk_size:
+            written += _write_chunk(file, chunk, written)
+            chunk = []
+
+    if chunk:
+        written += _write_chunk(file, chunk, written)
+
+    return written
+
+
+def _write_chunk(file: BinaryIO, chunk: List[bytes], offset: int) -> int:
+    invalid = find_invalid_states(chunk)
+    if invalid:
+        raise Exception(f"State {offset + invalid[0]} is not a valid cube state.")
+
+    file.write(_encode_chunk(chunk))
+    return len(chunk)
+
+
+def read_states(file: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE, skip_invalid: bool = False) -> Iterator[bytes]:
+    """
+    Reads the packed states of a file written by write_states, holding at most chunk_size of them in memory at a time.
+    Every chunk is validated before any of its states is returned.
+    :param skip_invalid: If True, invalid states are left out instead of raising an exception.
+    :return: An iterator of packed states.
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise Exception("Not a cube state file.")
+
+    offset = 0
+    while True:
+        data = file.read(chunk_size * STATE_SIZE)
+        if not data:
+            return
+
+        if len(data) % STATE_SIZE:
+            raise Exception("Cube state file is truncated.")
+
+        colors = _decode_columns(data)
+        invalid = _find_invalid_columns(colors)
+        if invalid and not skip_invalid:
+            raise Exception(f"State {offset + invalid[0]} is not a valid cube state.")
+
+        invalid = set(invalid)
+        for index, key in enumerate(map(bytes, zip(*colors))):
+            if index not in invalid:
+                yield key
+
+        offset += len(data) // STATE_SIZE
+
+
+def parse_moves(notation: str) -> List[str]:
+    """
+    Parses a sequence of moves in standard notation, e.g. "R U R' U2".
+    :return: List of the corresponding operations of all_cube_operations. A half turn becomes two clockwise operations.
+    """
+    operations = []
+    for move in notation.split():
+        face = _NOTATION.get(move[0])
+        if face is None or move[1:] not in ('', "'", '2'):
+            raise Exception(f"Invalid move {move}.")
+
+        if move[1:] == "'":
+            operations.append(f"{face}_counterclockwise")
+        else:
+            operations.extend([f"{face}_clockwise"] * (2 if move[1:] == '2' else 1))
+
+    return operations
+
+
+def format_moves(operations: List[str]) -> str:
+    """
+    Inverse of parse_moves. Two equal operations in a row are written as a half turn.
+    """
+    moves = []
+    i = 0
+    while i < len(operations):
+        if operations[i] not in _OPERATION_NOTATION:
+            raise Exception(f"Invalid operation {operations[i]}.")
+
+        move = _OPERATION_NOTATION[operations[i]]
+        if i + 1 < len(operations) and operations[i + 1] == operations[i]:
+            move = f"{move[0]}2"
+            i += 1
+
+        moves.append(move)
+        i += 1
+
+    return ' '.join(moves)
+
+
+def write_solutions(file: TextIO, solutions: Iterable[List[str]]) -> int:
+    """
+    Writes lists of operations to a text file, one solution per line in standard notation.
+    :return: Number of solutions written.
+    """
+    written = 0
+    for operations in solutions:
+        file.write(format_moves(operations) + '\n')
+        written += 1
+
+    return written
+
+
+def read_solutions(file: TextIO) -> Iterator[List[str]]:
+    """
+    :return: An iterator of the lists of operations of a file written by write_solutions.
+    """
+    for line in file:
+        yield parse_moves(line)
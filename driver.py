@@ -1,14 +1,55 @@
 import sys
-from rubiks_cube import RubiksCube, CubeState
+from rubiks_cube import RubiksCube, CubeState, HEURISTIC_TABLE
 from space_search import solve
+from staged_solver import solve_in_stages, StageFailure
+from optimal_solver import solve_cube_optimally
+import profiler
 
 if __name__ == '__main__':
 
     # Driver Code
 
+    if len(sys.argv) > 1 and sys.argv[1] == 'profile':
+        # Profile the solver: python driver.py profile --help
+        profiler.main(sys.argv[2:])
+        sys.exit(0)
+
     if len(sys.argv) != 2:
         raise Exception(f"Number of arguments expected is: 2. Got {len(sys.argv)}.")
 
+    if sys.argv[1] == 'staged':
+        # Solve the whole cube layer by layer, one bounded search per stage.
+        try:
+            operations, reports = solve_in_stages(RubiksCube.give_me_cube(18))
+        except StageFailure as e:
+            print("=================")
+            for report in e.reports:
+                print(report)
+            print("=================")
+            print(e)
+            sys.exit(1)
+
+        print("=================")
+        for report in reports:
+            print(report)
+
+        print("=================")
+        print("Sequence of rotations to solve the cube:")
+        print(". ".join(operations))
+        print("=================")
+        sys.exit(0)
+
+    if sys.argv[1] == 'optimal':
+        # Find a shortest solution. Only practical for lightly shuffled cubes.
+        operations, lower_bound = solve_cube_optimally(RubiksCube.give_me_cube(8))
+
+        print("=================")
+        print(f"Shortest sequence of rotations to solve the cube ({len(operations)} rotations, lower bound "
+              f"{lower_bound}, verified):")
+        print(". ".join(operations))
+        print("=================")
+        sys.exit(0)
+
     k = 1
     try:
         k = int(sys.argv[1])
@@ -23,7 +64,7 @@ if __name__ == '__main__':
 
 
     def heuristic(cube_state: CubeState) -> float:
-        return RubiksCube.heuristic(cube_state.get_cube())
+        return HEURISTIC_TABLE(cube_state.get_key())
 
 
     def d(parent, child):
@@ -0,0 +1,127 @@
+from collections import deque
+from typing import List, Tuple, Dict
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, PACKED_OPERATIONS, get_sticker_orbits
+from space_search import solve_optimal, admissible, SearchStats
+
+
+class PatternDatabase:
+    """
+    Admissible heuristic made of one pattern database per color and orbit of positions. A pattern only keeps which
+    positions of the orbit hold the color, so every operation on the cube is also an operation on the pattern. The
+    number of operations a pattern needs to reach its goal pattern, found by a breadth first search from the goal, is
+    then never more than the operations the cube needs. The heuristic is the maximum over all databases, which keeps it
+    admissible and consistent.
+    """
+
+    def __init__(self, goal_key: bytes):
+        """
+        :param goal_key: Packed state the heuristic estimates the distance to.
+        """
+        self._databases = []
+        for orbit in get_sticker_orbits():
+            if len(orbit) == 1:
+                # Centers never move.
+                continue
+
+            moves = PatternDatabase._get_orbit_moves(orbit)
+            for color in set(goal_key[position] for position in orbit):
+                goal = sum(1 << i for i, position in enumerate(orbit) if goal_key[position] == color)
+                self._databases.append((orbit, color, PatternDatabase._get_distances(goal, moves)))
+
+    def __call__(self, key: bytes) -> int:
+        """
+        :param key: Packed state, as returned by CubeState.get_key.
+        :return: Lower bound on the number of operations between the state and the goal.
+        """
+        estimate = 0
+        for orbit, color, distances in self._databases:
+            pattern = 0
+            for i, position in enumerate(orbit):
+                if key[position] == color:
+                    pattern |= 1 << i
+            estimate = max(estimate, distances.get(pattern, 0))
+
+        return estimate
+
+    @staticmethod
+    def _get_orbit_moves(orbit: List[int]) -> List[List[int]]:
+        """
+        :return: For every operation, the bit each bit of a pattern moves to.
+        """
+        bits = {position: i for i, position in enumerate(orbit)}
+        moves = []
+        for operation in PACKED_OPERATIONS:
+            destinations = [0] * len(orbit)
+            for position, source in enumerate(operation(range(54))):
+                if position in bits:
+                    destinations[bits[source]] = bits[position]
+            moves.append(destinations)
+
+        return moves
+
+    @staticmethod
+    def _get_distances(goal: int, moves: List[List[int]]) -> Dict[int, int]:
+        """
+        Breadth first search from the goal pattern. Every operation has an inverse operation, so the distance from the
+        goal to a pattern is also the distance from the pattern to the goal.
+        :return: Number of operations between every reachable pattern and the goal pattern.
+        """
+        distances = {goal: 0}
+        queue = deque([goal])
+        while queue:
+            pattern = queue.popleft()
+            bits = [i for i in range(len(moves[0])) if pattern >> i & 1]
+            for destinations in moves:
+                child = 0
+                for i in bits:
+                    child |= 1 << destinations[i]
+
+                if child not in distances:
+                    distances[child] = distances[pattern] + 1
+                    queue.append(child)
+
+        return distances
+
+
+_solved_pattern_database = None
+
+
+def get_solved_pattern_database() -> PatternDatabase:
+    """
+    :return: Pattern database heuristic for the solved cube. It is built on first use.
+    """
+    global _solved_pattern_database
+    if _solved_pattern_database is None:
+        _solved_pattern_database = PatternDatabase(CubeState(SOLVED_CUBE).get_key())
+
+    return _solved_pattern_database
+
+
+def solve_cube_optimally(cube: List, stats: SearchStats = None, max_expansions: int = None) -> Tuple[List[str], float]:
+    """
+    Finds a shortest sequence of operations that solves the cube and checks it by replaying it on the cube.
+    :param cube: Cube to solve. It is not modified.
+    :param stats: Optional SearchStats object that gets filled in with the search counters.
+    :param max_expansions: Optional upper bound on the number of expanded states.
+    :return: The operations and the certified lower bound on the number of operations of any solution.
+    """
+    pattern_database = get_solved_pattern_database()
+    goal_key = CubeState(SOLVED_CUBE).get_key()
+
+    def is_solved(cube_state: CubeState) -> bool:
+        return cube_state.get_key() == goal_key
+
+    @admissible
+    def heuristic(cube_state: CubeState) -> int:
+        return pattern_database(cube_state.get_key())
+
+    def d(parent, child):
+        return 1
+
+    path, lower_bound = solve_optimal(CubeState(cube), is_solved, heuristic, d, stats, max_expansions)
+
+    operations = [state.get_parent_operation() for state in path[1:]]
+    if len(operations) != lower_bound or not RubiksCube.verify_solution(cube, operations):
+        raise Exception("The solution failed verification.")
+
+    return operations, lower_bound
@@ -0,0 +1,187 @@
+import argparse
+import cProfile
+import gc
+import os
+import pstats
+import random
+import signal
+from collections import Counter
+from copy import deepcopy
+from typing import List, Callable, Dict
+from cube_io import parse_moves
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, HEURISTIC_TABLE
+from space_search import solve, SearchStats, SearchFailure
+
+# Every cube is solved three times, and a search to a face of a well scrambled cube can run for minutes. The default
+# bound keeps a plain run at a few seconds per pass and cube.
+DEFAULT_MAX_EXPANSIONS = 20000
+
+
+class StackSampler:
+    """
+    Records the call stack of the running code at a fixed interval of CPU time, in the collapsed format used by
+    flamegraph tools: one line per distinct stack, frames separated by ';' from the outermost one, followed by the
+    number of samples.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples = Counter()
+
+    def _sample(self, signum, frame) -> None:
+        stack = []
+        while frame is not None:
+            stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+
+        stack.reverse()
+        self.samples[';'.join(stack)] += 1
+
+    def start(self) -> None:
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, 'w') as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class HeapSnapshot:
+    """
+    Object counts by type, taken when the frontier of a search reaches its peak size. Only objects tracked by the
+    garbage collector (e.g. CubeState objects, lists and tuples of objects) are counted, bytes are not.
+    """
+
+    def __init__(self):
+        self.frontier = 0
+        self.counts = Counter()
+        self.taken = False
+
+    def take(self, frontier: int) -> None:
+        self.frontier = frontier
+        self.taken = True
+        self.counts = Counter(type(o).__name__ for o in gc.get_objects())
+
+
+def get_corpus(scramble: str = None, seed: int = 0, count: int = 1, rotations: int = 18) -> List[List]:
+    """
+    :param scramble: Moves in standard notation applied to the solved cube. If given, the corpus is this one cube.
+    :return: The cubes to solve. Without a scramble, count cubes shuffled with the given seed.
+    """
+    if scramble is not None:
+        cube = deepcopy(SOLVED_CUBE)
+        for operation in parse_moves(scramble):
+            getattr(RubiksCube, operation)(cube)
+        return [cube]
+
+    random.seed(seed)
+    return [RubiksCube.give_me_cube(rotations) for _ in range(count)]
+
+
+def _heuristic(cube_state: CubeState) -> float:
+    return HEURISTIC_TABLE(cube_state.get_key())
+
+
+def _solve_corpus(corpus: List[List], faces: int, max_expansions: int,
+                  watch: Callable[[int, SearchStats], None] = None) -> List[SearchStats]:
+    """
+    Solves every cube of the corpus the same way driver.py does. A search that gives up is still part of the profile.
+    :param watch: Optional callable. Receives the index of the cube and the stats of its search every time a state is
+    taken from the frontier, before the state is removed from it.
+    """
+    def d(parent, child):
+        return 1
+
+    all_stats = []
+    for index, cube in enumerate(corpus):
+        stats = SearchStats()
+
+        def is_solved(cube_state: CubeState) -> bool:
+            if watch is not None:
+                watch(index, stats)
+            return RubiksCube.count_solved_faces(cube_state.get_cube()) >= faces
+
+        try:
+            solve(CubeState(cube), is_solved, _heuristic, d, stats, max_expansions)
+        except SearchFailure as e:
+            print(f"Cube {index}: {e}")
+        all_stats.append(stats)
+
+    return all_stats
+
+
+def profile_corpus(corpus: List[List], faces: int = 1, max_expansions: int = DEFAULT_MAX_EXPANSIONS,
+                   interval: float = 0.001) -> Dict:
+    """
+    Solves every cube of the corpus three times: once under the stack sampler, once to count the heap at the peak
+    frontier size and once under cProfile. The passes are kept apart so that neither cProfile's overhead nor the heap
+    counting distort the samples. The search is deterministic, so the first pass tells the peak frontier size and the
+    second one counts the heap exactly when the frontier reaches it again.
+    :param max_expansions: Upper bound on the expanded states of each search. None removes the bound.
+    :return: Dict with the 'sampler', the 'profile' (pstats.Stats), a 'heap' snapshot per cube and the 'stats' of the
+    searches.
+    """
+    sampler = StackSampler(interval)
+    sampler.start()
+    try:
+        stats = _solve_corpus(corpus, faces, max_expansions)
+    finally:
+        sampler.stop()
+
+    snapshots = [HeapSnapshot() for _ in corpus]
+
+    def watch(index: int, search_stats: SearchStats) -> None:
+        # The frontier still holds the state being taken from it, so it is exactly as large as the peak here.
+        if not snapshots[index].taken and search_stats.peak_frontier >= stats[index].peak_frontier:
+            snapshots[index].take(search_stats.peak_frontier)
+
+    _solve_corpus(corpus, faces, max_expansions, watch)
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        _solve_corpus(corpus, faces, max_expansions)
+    finally:
+        profile.disable()
+
+    return {'sampler': sampler, 'profile': pstats.Stats(profile), 'heap': snapshots, 'stats': stats}
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(prog='driver.py profile',
+                                     description="Profile space_search.solve on a scramble or a seeded corpus.")
+    parser.add_argument('--scramble', help="Moves in standard notation, e.g. \"R U R' U2\".")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the corpus when no scramble is given.")
+    parser.add_argument('--count', type=int, default=1, help="Number of cubes in the corpus.")
+    parser.add_argument('--rotations', type=int, default=18, help="Random rotations per cube of the corpus.")
+    parser.add_argument('--faces', type=int, default=1, help="Number of faces to solve.")
+    parser.add_argument('--max-expansions', type=int, default=DEFAULT_MAX_EXPANSIONS,
+                        help="Upper bound on the expanded states of each search. 0 removes the bound.")
+    parser.add_argument('--interval', type=float, default=0.001, help="Seconds of CPU time between stack samples.")
+    parser.add_argument('--collapsed', default='profile.folded', help="Output file of the collapsed stacks.")
+    parser.add_argument('--pstats', help="Optional output file of the cProfile statistics.")
+    parser.add_argument('--top', type=int, default=20, help="Number of functions and types to print.")
+    args = parser.parse_args(argv)
+
+    corpus = get_corpus(args.scramble, args.seed, args.count, args.rotations)
+    result = profile_corpus(corpus, args.faces, args.max_expansions or None, args.interval)
+
+    print("=================")
+    for i, (stats, snapshot) in enumerate(zip(result['stats'], result['heap'])):
+        print(f"Cube {i}: {stats.expanded_nodes} expanded states, {stats.generated_nodes} generated states, "
+              f"peak frontier {stats.peak_frontier}, {stats.elapsed_time:.3f}s")
+        print(f"Heap at frontier size {snapshot.frontier}: " +
+              ", ".join(f"{name} {count}" for name, count in snapshot.counts.most_common(args.top)))
+
+    print("=================")
+    result['profile'].sort_stats('tottime').print_stats(args.top)
+    if args.pstats:
+        result['profile'].dump_stats(args.pstats)
+
+    result['sampler'].write_collapsed(args.collapsed)
+    print(f"{sum(result['sampler'].samples.values())} stack samples written to {args.collapsed}")
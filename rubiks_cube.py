@@ -2,7 +2,8 @@ import random
 from random import shuffle
 from enum import Enum
 from copy import deepcopy
-from typing import List, Tuple, Union
+from operator import itemgetter
+from typing import List, Tuple, Union, Optional, Iterator, Callable
 from space_search import State
 
 
@@ -39,6 +40,7 @@ all_cube_operations = ['up_clockwise', 'up_counterclockwise', 'down_clockwise',
                        'down_counterclockwise', 'back_clockwise', 'back_counterclockwise',
                        'front_clockwise', 'front_counterclockwise', 'left_clockwise',
                        'left_counterclockwise', 'right_clockwise', 'right_counterclockwise']
+cube_operation_indices = {operation: index for index, operation in enumerate(all_cube_operations)}
 
 # These 2 sets have faces that are completely opposite to each other.
 first_set = {'up', 'left', 'front'}
@@ -47,14 +49,18 @@ second_set = {'down', 'right', 'back'}
 
 class CubeState(State):
 
-    def __init__(self, cube: List):
-        self._cube = CubeState._get_cube_state(cube)
+    def __init__(self, cube: Optional[List], operations: List[str] = None, key: bytes = None):
+        # The packed state is enough to describe the cube. When the state is created from its key, the nested list is
+        # not stored and get_cube builds it when asked.
+        self._cube = CubeState._get_cube_state(cube) if key is None else key
         self._cube_list = cube
         self._g_score = 0
         self._h_score = 0
         self._parent = None  # Parent state
         self._parent_operation = None  # Operation that was applied to parent and led to current state
         self._prohibit_operation = None
+        # Operations this state (and its children) may apply. Used to keep already solved parts of the cube intact.
+        self._operations = all_cube_operations if operations is None else operations
 
     def __hash__(self) -> int:
         return hash(self._cube)
@@ -62,11 +68,21 @@ class CubeState(State):
     def __eq__(self, other: 'CubeState') -> bool:
         return self._cube == other._cube
 
-    def __lt__(self, other: 'CubeState'):
-        return self._h_score + self._g_score < other._h_score + other._g_score
-
     def get_children(self) -> List['CubeState']:
-        return self._get_children_states()
+        return [self.make_child(move, key) for move, key in self.get_successors()]
+
+    def get_successors(self) -> Iterator[Tuple[int, bytes]]:
+        for move in self._get_children_moves():
+            yield move, CubeState.apply_packed_operation(self._cube, move)
+
+    def make_child(self, move: int, key: bytes) -> 'CubeState':
+        child = self.from_key(key, move)
+
+        # If we have already done the same operation twice, we need to prohibit the child from doing it again.
+        if self._parent_operation is not None and self._parent_operation == all_cube_operations[move]:
+            child._prohibit_operation = self._parent_operation
+
+        return child
 
     def get_g_score(self) -> Union[float, int]:
         return self._g_score
@@ -87,17 +103,55 @@ class CubeState(State):
         self._parent = state
 
     def get_cube(self):
+        if self._cube_list is None:
+            return CubeState._get_cube_list(self._cube)
         return self._cube_list
 
     def get_parent_operation(self):
         return self._parent_operation
 
+    def get_operations(self) -> List[str]:
+        return self._operations
+
+    def get_key(self) -> bytes:
+        return self._cube
+
+    def get_incoming_move(self) -> Optional[int]:
+        if self._parent_operation is None:
+            return None
+        return cube_operation_indices[self._parent_operation]
+
+    def predecessor_key(self, key: bytes, move: int) -> bytes:
+        return CubeState.apply_packed_operation(key, INVERSE_OPERATIONS[move])
+
+    def from_key(self, key: bytes, move: Optional[int]) -> 'CubeState':
+        state = CubeState(None, self._operations, key)
+        state._parent_operation = None if move is None else all_cube_operations[move]
+        return state
+
+    @staticmethod
+    def apply_packed_operation(key: bytes, move: int) -> bytes:
+        """
+        Applies an operation directly to a packed cube state.
+        :param move: Index of the operation in all_cube_operations.
+        :return: The packed state of the resulting cube.
+        """
+        return bytes(PACKED_OPERATIONS[move](key))
+
+    @staticmethod
+    def _get_cube_state(cube: List) -> bytes:
+        """
+        :return: the actual values (current state of the cube) packed into bytes
+        """
+        return bytes([cube[i][j][k] for k in range(3) for j in range(3) for i in range(6)])
+
     @staticmethod
-    def _get_cube_state(cube: List) -> Tuple:
+    def _get_cube_list(key: bytes) -> List:
         """
-        :return: a tuple of the actual values (current state of the cube)
+        Inverse of _get_cube_state.
+        :return: the nested list representation of a packed cube state
         """
-        return tuple([cube[i][j][k] for k in range(3) for j in range(3) for i in range(6)])
+        return [[[key[(k * 3 + j) * 6 + i] for k in range(3)] for j in range(3)] for i in range(6)]
 
     @staticmethod
     def _are_operations_opposite(o1: str, o2: str) -> bool:
@@ -129,10 +183,12 @@ class CubeState(State):
 
         return False
 
-    def _get_children_states(self):
-
-        children = []
-        for operation in all_cube_operations:
+    def _get_children_moves(self) -> Iterator[int]:
+        """
+        :return: The indices of the operations that lead to children of this state, after pruning the ones that lead
+        back to an already seen state.
+        """
+        for operation in self._operations:
 
             if self._parent_operation is not None:
                 # Check if we do an operation that leads us to our parent state.
@@ -151,31 +207,14 @@ class CubeState(State):
             if self._prohibit_operation is not None and self._prohibit_operation == operation:
                 continue
 
-            cube_copy = deepcopy(self._cube_list)
-            try:
-                op = getattr(RubiksCube, operation)
-                op(cube_copy)
-
-                new_state = CubeState(cube_copy)
-
-                # If we have already done the same operation twice, we need to prohibit the child from doing it again.
-                if self._parent_operation is not None and self._parent_operation == operation:
-                    new_state._prohibit_operation = operation
-
-                new_state._parent_operation = operation
-                children.append(new_state)
-
-            except AttributeError:
-                print(f"Attribute not found for operation {operation}")
-
-        return children
+            yield cube_operation_indices[operation]
 
 
 class RubiksCube:
 
     @staticmethod
     def give_me_cube(random_rotations=10) -> List:
-        new_cube = list(SOLVED_CUBE)
+        new_cube = deepcopy(SOLVED_CUBE)
         RubiksCube.shuffle_cube(new_cube, random_rotations)
         return new_cube
 
@@ -193,6 +232,23 @@ class RubiksCube:
         for i in range(number_of_rotations):
             functions_on_cube[random.randint(0, l - 1)](cube)
 
+    @staticmethod
+    def verify_solution(cube: List, operations: List[str], is_goal: Callable[[List], bool] = None) -> bool:
+        """
+        Replays the operations on a copy of the cube.
+        :param is_goal: Callable. Receives the resulting cube. Defaults to checking that all faces are solved.
+        :return: Whether the operations are valid and lead to a goal.
+        """
+        cube = deepcopy(cube)
+        for operation in operations:
+            if operation not in all_cube_operations:
+                return False
+            getattr(RubiksCube, operation)(cube)
+
+        if is_goal is None:
+            return RubiksCube.count_solved_faces(cube) == 6
+        return is_goal(cube)
+
     @staticmethod
     def count_solved_faces(cube: List) -> int:
         """
@@ -677,3 +733,107 @@ class RubiksCube:
             cube[face][0][1], \
             cube[face][1][2], \
             cube[face][2][1]
+
+
+def _get_packed_operation(operation: str) -> itemgetter:
+    """
+    Applies the operation to a cube whose stickers are their own positions in the packed state. The result tells, for
+    every position, which position its sticker comes from.
+    :return: A callable that applies the operation to a packed state.
+    """
+    positions = CubeState._get_cube_list(range(54))
+    getattr(RubiksCube, operation)(positions)
+    return itemgetter(*CubeState._get_cube_state(positions))
+
+
+def _get_inverse_operation(operation: str) -> str:
+    face, direction = operation.split('_')
+    return f"{face}_{'clockwise' if direction == 'counterclockwise' else 'counterclockwise'}"
+
+
+# Operations on packed states, in the order of all_cube_operations, and the index of the operation that undoes each one.
+PACKED_OPERATIONS = [_get_packed_operation(operation) for operation in all_cube_operations]
+INVERSE_OPERATIONS = [all_cube_operations.index(_get_inverse_operation(operation)) for operation in all_cube_operations]
+
+
+def get_sticker_orbits() -> List[List[int]]:
+    """
+    Groups the positions of a packed state that the operations can move stickers between. The centers each form a group
+    of their own, the other stickers split into corner and edge positions.
+    :return: List of groups of positions.
+    """
+    parents = list(range(54))
+
+    def find(position: int) -> int:
+        while parents[position] != position:
+            position = parents[position]
+        return position
+
+    for operation in PACKED_OPERATIONS:
+        for position, source in enumerate(operation(range(54))):
+            parents[find(position)] = find(source)
+
+    orbits = {}
+    for position in range(54):
+        orbits.setdefault(find(position), []).append(position)
+
+    return list(orbits.values())
+
+
+class HeuristicTable:
+    """
+    Compiles a heuristic of RubiksCube into a table of scores per sticker position and color, so it can be evaluated on
+    a packed state with one table lookup per sticker. This only works for heuristics that are a sum of independent
+    per-sticker costs, which is the case for heuristic, heuristic2 and heuristic3. Use verify to check a heuristic.
+    """
+
+    def __init__(self, heuristic: Callable[[List], float]):
+        self._heuristic = heuristic
+
+        # The table is generated by changing one sticker at a time on the solved cube and recording how much the
+        # heuristic changes. The value of any cube is then the value of the solved cube plus the change of every sticker.
+        solved_key = CubeState(SOLVED_CUBE).get_key()
+        self._base = heuristic(CubeState._get_cube_list(solved_key))
+        self._positions = []
+        self._scores = []
+        for position in range(len(solved_key)):
+            scores = [0.0] * 7
+            for color in Color:
+                cube = bytearray(solved_key)
+                cube[position] = color.value
+                scores[color.value] = heuristic(CubeState._get_cube_list(cube)) - self._base
+
+            # Positions whose color never changes the heuristic are left out.
+            if any(scores):
+                self._positions.append(position)
+                self._scores.append(scores)
+
+        self._get_colors = itemgetter(*self._positions)
+
+    def __call__(self, key: bytes) -> float:
+        """
+        :param key: Packed state, as returned by CubeState.get_key.
+        :return: The value of the heuristic for the state.
+        """
+        return self._base + sum(map(list.__getitem__, self._scores, self._get_colors(key)))
+
+    def verify(self, samples: int = 1000, seed: int = 0) -> bool:
+        """
+        Compares the table with the heuristic it was generated from on random cubes.
+        :return: True if they give identical values on every sample.
+        """
+        generator = random.Random(seed)
+        for _ in range(samples):
+            key = CubeState(SOLVED_CUBE).get_key()
+            for _ in range(generator.randint(0, 50)):
+                key = CubeState.apply_packed_operation(key, generator.randrange(len(all_cube_operations)))
+
+            if self(key) != self._heuristic(CubeState._get_cube_list(key)):
+                return False
+
+        return True
+
+
+HEURISTIC_TABLE = HeuristicTable(RubiksCube.heuristic)
+HEURISTIC2_TABLE = HeuristicTable(RubiksCube.heuristic2)
+HEURISTIC3_TABLE = HeuristicTable(RubiksCube.heuristic3)
@@ -1,6 +1,11 @@
+import heapq
+import math
+import random
+import time
 from abc import abstractmethod, ABC
-from typing import List, Union, Callable
-from queue import PriorityQueue
+from array import array
+from itertools import count
+from typing import List, Union, Callable, Optional, Tuple, Iterator, Hashable, Dict
 
 
 class State(ABC):
@@ -26,19 +31,24 @@ class State(ABC):
         pass
 
     @abstractmethod
-    def __lt__(self, other: 'State') -> bool:
+    def get_children(self) -> List['State']:
         """
-        Compares two State objects in terms of their f-score. F-score calculation depends on classes derived from State.
-        Useful for priority queue used by A* algorithm.
-        :param other:
-        :return: boolean value.
+        :return: A list of objects of type State. These objects come directly from a parent state.
         """
         pass
 
     @abstractmethod
-    def get_children(self) -> List['State']:
+    def get_successors(self) -> Iterator[Tuple[int, Hashable]]:
         """
-        :return: A list of objects of type State. These objects come directly from a parent state.
+        Lazy alternative to get_children that does not create any State object.
+        :return: An iterator of (move, key) pairs, one for each child of this state.
+        """
+        pass
+
+    @abstractmethod
+    def make_child(self, move: int, key: Hashable) -> 'State':
+        """
+        :return: The child state for a (move, key) pair returned by get_successors.
         """
         pass
 
@@ -66,17 +76,185 @@ class State(ABC):
     def set_parent(self, state: 'State') -> None:
         pass
 
+    @abstractmethod
+    def get_key(self) -> Hashable:
+        """
+        :return: A compact, hashable representation of the state. Two states are equal if their keys are equal.
+        """
+        pass
 
-# A* Algorithm
-def solve(start: State, is_goal: Callable, h: Callable, d: Callable) -> List[State]:
+    @abstractmethod
+    def get_incoming_move(self) -> Optional[int]:
+        """
+        :return: Index of the move that was applied to the parent state and led to this one. None for a start state.
+        """
+        pass
+
+    @abstractmethod
+    def predecessor_key(self, key: Hashable, move: int) -> Hashable:
+        """
+        Undoes a move on a key.
+        :return: The key of the state that the move was applied to in order to reach the given key.
+        """
+        pass
+
+    @abstractmethod
+    def from_key(self, key: Hashable, move: Optional[int]) -> 'State':
+        """
+        :return: A new state for the key, reached through the given move.
+        """
+        pass
+
+
+class SearchFailure(Exception):
     """
-    Function that uses A* Algorithm to find the best path to a solution.
-    :param start: Object of type State.
-    :param is_goal: Callable. A function that returns whether the current state is a final state or not.
-    :param h: Callable. A heuristic function that estimates the cost between current state and final state.
-    :param d: Callable. A function that returns the cost of the distance between parent and child states.
-    :return:
+    Raised when a search ends without a solution, either because there is none or because it ran out of its expansion
+    or time budget. Invalid arguments and errors raised by the callables given to a search are not turned into it.
+    """
+
+
+class SearchStats:
+    """
+    Counters collected while a search is running. Pass an instance to a search function to have it filled in.
+    """
+
+    def __init__(self):
+        self.expanded_nodes = 0  # States whose children have been generated
+        self.generated_nodes = 0  # Children added to the frontier
+        self.peak_frontier = 0  # Largest size the frontier reached
+        self.max_depth = 0  # Most states on the path of a depth first search, which keeps no frontier
+        self.elapsed_time = 0.0  # Wall clock seconds spent inside the search
+        self.table_lookups = 0  # Transposition table lookups
+        self.table_hits = 0  # Lookups that found the state in the transposition table
+        self.table_collisions = 0  # Stores that had to evict a different state from the transposition table
+        # Largest g + h of the states taken from the frontier by the last call to solve. If the heuristic is admissible
+        # and consistent, no solution costs less than this. Unlike the other counters it is not accumulated, since a
+        # bound found for one start state says nothing about another.
+        self.lower_bound = 0.0
+
+    def table_hit_rate(self) -> float:
+        return self.table_hits / self.table_lookups if self.table_lookups else 0.0
+
+
+class TranspositionTable:
+    """
+    Fixed size, open addressed table that remembers the best g-score and the search bound a state was visited with.
+    States are keyed by their hash, so memory stays at 24 bytes per slot no matter how long the search runs. Two
+    different states with the same hash are treated as the same state.
+    """
+
+    def __init__(self, size: int = 1 << 20, probes: int = 4):
+        """
+        :param size: Number of slots. This is the memory cap of the table.
+        :param probes: Number of consecutive slots examined for a key before an entry gets replaced.
+        """
+        if size < 1 or probes < 1:
+            raise Exception("Transposition table size and probes must be positive.")
+
+        self._size = size
+        self._probes = min(probes, size)
+        # 0 marks an empty slot, so a hash of 0 is stored as 1.
+        self._keys = array('q', bytes(8 * size))
+        self._g_scores = array('d', bytes(8 * size))
+        self._bounds = array('d', bytes(8 * size))
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _key(state_hash: int) -> int:
+        return state_hash if state_hash != 0 else 1
+
+    def lookup(self, state_hash: int) -> Optional[Tuple[float, float]]:
+        """
+        :return: The (g-score, bound) pair stored for the state or None if the state is not in the table.
+        """
+        key = TranspositionTable._key(state_hash)
+        index = key % self._size
+        for _ in range(self._probes):
+            if self._keys[index] == key:
+                return self._g_scores[index], self._bounds[index]
+            if self._keys[index] == 0:
+                return None
+            index = (index + 1) % self._size
+
+        return None
+
+    def store(self, state_hash: int, g_score: float, bound: float) -> bool:
+        """
+        Stores the state keeping the lowest g-score seen for it. When all probed slots hold other states, the one with
+        the highest g-score is replaced, since deep states are the cheapest to search again.
+        :return: True if a different state had to be evicted.
+        """
+        key = TranspositionTable._key(state_hash)
+        index = key % self._size
+        victim = index
+        for _ in range(self._probes):
+            stored_key = self._keys[index]
+            if stored_key == key:
+                if g_score <= self._g_scores[index]:
+                    self._put(index, key, g_score, bound)
+                return False
+            if stored_key == 0:
+                self._put(index, key, g_score, bound)
+                return False
+            if self._g_scores[index] > self._g_scores[victim]:
+                victim = index
+            index = (index + 1) % self._size
+
+        self._put(victim, key, g_score, bound)
+        return True
+
+    def _put(self, index: int, key: int, g_score: float, bound: float) -> None:
+        self._keys[index] = key
+        self._g_scores[index] = g_score
+        self._bounds[index] = bound
+
+    def clear(self) -> None:
+        self._keys = array('q', bytes(8 * self._size))
+
+
+def admissible(h: Callable) -> Callable:
+    """
+    Marks a heuristic as admissible, meaning it never overestimates the cost between a state and the closest goal. Only
+    heuristics marked this way are accepted by solve_optimal.
+    :return: The same heuristic.
+    """
+    h.admissible = True
+    return h
+
+
+def _check_consistency(start: State, is_goal: Callable, h: Callable, d: Callable, samples: int, seed: int = 0) -> None:
+    """
+    Checks the heuristic on edges sampled by random walks from the start state. Every edge must satisfy
+    h(parent) <= d(parent, child) + h(child), costs must be positive and goals must have a heuristic of 0.
     """
+    generator = random.Random(seed)
+    state = start
+    for i in range(samples):
+        successors = list(state.get_successors())
+        if not successors or i % 20 == 0:
+            state = start
+            successors = list(state.get_successors())
+            if not successors:
+                return
+
+        move, key = generator.choice(successors)
+        child = state.make_child(move, key)
+        cost = d(state, child)
+        if cost <= 0:
+            raise Exception("The cost between parent and child states must be positive.")
+
+        if h(state) > cost + h(child):
+            raise Exception("The heuristic is not consistent.")
+
+        if is_goal(child) and h(child) != 0:
+            raise Exception("The heuristic is not 0 on a goal state.")
+
+        state = child
+
+
+def _check_arguments(start: State, is_goal: Callable, h: Callable, d: Callable) -> None:
     if not isinstance(start, State):
         raise Exception("'start' must inherit from State class.")
 
@@ -89,61 +267,478 @@ def solve(start: State, is_goal: Callable, h: Callable, d: Callable) -> List[Sta
     if not isinstance(d, Callable):
         raise Exception("'d' must be callable.")
 
-    # Open set and q include states who have not been explored completely (Frontier). We use a combination of set and
-    # priority queue to achieve access to minimum value in O(logn) time while adding and searching for an item in O(1)
-    # time.
-    open_set = set()
-    q = PriorityQueue()
 
-    # Closed set includes states whose all children have been explored.
+def _reconstruct_path(state: State) -> List[State]:
+    reconstruct_path = []
+    while state.get_parent() is not None:
+        reconstruct_path.append(state)
+        state = state.get_parent()
+
+    reconstruct_path.append(state)
+    reconstruct_path.reverse()
+    return reconstruct_path
+
+
+def _reconstruct_path_from_moves(state: State, closed_moves: Dict[Hashable, Tuple]) -> List[State]:
+    """
+    Rebuilds the path to a state by undoing moves, starting from the state and looking up in the closed set the move
+    that led to each of its predecessors.
+    """
+    reconstruct_path = [state]
+    key, move = state.get_key(), state.get_incoming_move()
+    while move is not None:
+        key = state.predecessor_key(key, move)
+        g_score, move = closed_moves[key]
+        predecessor = state.from_key(key, move)
+        predecessor.set_g_score(g_score)
+        reconstruct_path[-1].set_parent(predecessor)
+        reconstruct_path.append(predecessor)
+
+    reconstruct_path.reverse()
+    return reconstruct_path
+
+
+# A* Algorithm
+def solve(start: State, is_goal: Callable, h: Callable, d: Callable, stats: SearchStats = None,
+          max_expansions: int = None, transposition_table: TranspositionTable = None,
+          weight: float = 1.0, keep_parents: bool = True) -> List[State]:
+    """
+    Function that uses A* Algorithm to find the best path to a solution. With a weight above 1 it runs weighted A*
+    (f = g + weight * h), which usually finds a solution much faster at the price of its cost being up to weight times
+    the best one.
+    :param start: Object of type State.
+    :param is_goal: Callable. A function that returns whether the current state is a final state or not.
+    :param h: Callable. A heuristic function that estimates the cost between current state and final state.
+    :param d: Callable. A function that returns the cost of the distance between parent and child states.
+    :param stats: Optional SearchStats object that gets filled in with the search counters.
+    :param max_expansions: Optional upper bound on the number of expanded states. The search gives up once it is
+    exceeded, which bounds its running time.
+    :param transposition_table: Optional TranspositionTable used instead of the unbounded closed set. Keeps memory of
+    the explored states bounded at the price of exploring evicted states again.
+    :param weight: Factor the heuristic is multiplied with when ordering the frontier.
+    :param keep_parents: If False, states do not keep a reference to their parent. The closed set then only maps the
+    key of every explored state to its g-score and the move that led to it, and the path is rebuilt by undoing moves
+    from the goal. Explored states can then be freed as soon as they are expanded.
+    :return:
+    """
+    _check_arguments(start, is_goal, h, d)
+
+    if weight < 1:
+        raise Exception("'weight' must be at least 1.")
+
+    if not keep_parents and transposition_table is not None:
+        raise Exception("A transposition table cannot be used when parents are not kept.")
+
+    if stats is None:
+        stats = SearchStats()
+
+    start_time = time.perf_counter()
+    expansions = 0
+    lower_bound = 0.0
+    stats.lower_bound = lower_bound
+
+    # Open set and heap include states who have not been explored completely (Frontier). We use a combination of dict
+    # and binary heap to achieve access to minimum value in O(logn) time while adding and searching for an item in O(1)
+    # time. The dict maps the key of every open state to the instance holding its best path. Heap entries are (f-score,
+    # insertion order, state) tuples, so the order is decided by the search and not by the State class. Entries whose
+    # state has been closed or reached through a better path since they were queued are skipped.
+    open_set = {}
+    heap = []
+    insertion_order = count()
+
+    def push(state: State) -> None:
+        heapq.heappush(heap, (state.get_g_score() + weight * state.get_h_score(), next(insertion_order), state))
+
+    # Closed set includes the keys of states whose all children have been explored. When parents are not kept,
+    # closed_moves is used instead and maps each of these keys to the state's (g-score, incoming move).
     closed_set = set()
+    closed_moves = {}
 
     start.set_g_score(0)
     start.set_h_score(h(start))
 
-    open_set.add(start)
-    q.put(start)
+    open_set[start.get_key()] = start
+    push(start)
 
     print("Solving...")
     while open_set:
 
-        # Find the state with the lowest f score in the open set (and priority queue)
-        current_state = None
-        if not q.empty():
-            current_state = q.get()
+        # Find the state with the lowest f score in the open set (and heap)
+        _, _, current_state = heapq.heappop(heap)
+        current_key = current_state.get_key()
+        if open_set.get(current_key) is not current_state:
+            continue
+
+        lower_bound = max(lower_bound, current_state.get_g_score() + current_state.get_h_score())
+        stats.lower_bound = lower_bound
 
         # If the current state is a goal, reconstruct the path and return
         if is_goal(current_state):
-            reconstruct_path = []
-            while current_state.get_parent() is not None:
-                reconstruct_path.append(current_state)
-                current_state = current_state.get_parent()
+            stats.elapsed_time += time.perf_counter() - start_time
+            if not keep_parents:
+                return _reconstruct_path_from_moves(current_state, closed_moves)
+            return _reconstruct_path(current_state)
 
-            reconstruct_path.append(current_state)
-            reconstruct_path.reverse()
-            return reconstruct_path
+        if max_expansions is not None and expansions >= max_expansions:
+            stats.elapsed_time += time.perf_counter() - start_time
+            raise SearchFailure(f"Algorithm exceeded the limit of {max_expansions} expanded states.")
 
-        open_set.remove(current_state)
-        closed_set.add(current_state)
+        del open_set[current_key]
+        if not keep_parents:
+            closed_moves[current_key] = (current_state.get_g_score(), current_state.get_incoming_move())
+        elif transposition_table is None:
+            closed_set.add(current_key)
+        elif transposition_table.store(hash(current_key), current_state.get_g_score(),
+                                       current_state.get_g_score() + current_state.get_h_score()):
+            stats.table_collisions += 1
+        expansions += 1
+        stats.expanded_nodes += 1
 
-        # Iterate over current state's children
-        for child in current_state.get_children():
-            if child in closed_set:
-                continue
+        # Iterate over the keys of current state's children. A child object is only created once we know it goes into
+        # the open set.
+        for move, child_key in current_state.get_successors():
+            if not keep_parents:
+                if child_key in closed_moves:
+                    continue
+            elif transposition_table is None:
+                if child_key in closed_set:
+                    continue
+            else:
+                stats.table_lookups += 1
+                if transposition_table.lookup(hash(child_key)) is not None:
+                    stats.table_hits += 1
+                    continue
 
-            if child in open_set:
+            queued_child = open_set.get(child_key)
+            if queued_child is not None:
                 # The cost between parent and child is the current cost from the root plus the cost between parent
-                # and child.
-                tentative_g_score = current_state.get_g_score() + d(current_state, child)
-                if tentative_g_score < child.get_g_score():
-                    # We found a better path. Update the parent.
+                # and child. The queued state is equal to the child, so it stands in for it.
+                tentative_g_score = current_state.get_g_score() + d(current_state, queued_child)
+                if tentative_g_score < queued_child.get_g_score():
+                    # We found a better path. The new child replaces the queued one, as it carries the operation that
+                    # leads to it from its new parent.
+                    child = current_state.make_child(move, child_key)
                     child.set_g_score(tentative_g_score)
-                    child.set_parent(current_state)
+                    child.set_h_score(queued_child.get_h_score())
+                    if keep_parents:
+                        child.set_parent(current_state)
+                    open_set[child_key] = child
+                    push(child)
             else:
+                child = current_state.make_child(move, child_key)
                 child.set_g_score(current_state.get_g_score() + d(current_state, child))
                 child.set_h_score(h(child))
+                if keep_parents:
+                    child.set_parent(current_state)
+                open_set[child_key] = child
+                push(child)
+                stats.generated_nodes += 1
+
+        stats.peak_frontier = max(stats.peak_frontier, len(open_set))
+
+    stats.elapsed_time += time.perf_counter() - start_time
+    raise SearchFailure("Algorithm failed to find a solution.")
+
+
+# IDA* Algorithm
+def ida_solve(start: State, is_goal: Callable, h: Callable, d: Callable, stats: SearchStats = None,
+              max_expansions: int = None, transposition_table: TranspositionTable = None,
+              order_children: bool = False) -> List[State]:
+    """
+    Function that uses Iterative Deepening A* to find a path to a solution. Memory grows only with the depth of the
+    path, unless a transposition table is given to cut duplicate subtrees.
+    :param start: Object of type State.
+    :param is_goal: Callable. A function that returns whether the current state is a final state or not.
+    :param h: Callable. A heuristic function that estimates the cost between current state and final state.
+    :param d: Callable. A function that returns the cost of the distance between parent and child states.
+    :param stats: Optional SearchStats object that gets filled in with the search counters.
+    :param max_expansions: Optional upper bound on the number of expanded states.
+    :param transposition_table: Optional TranspositionTable. A state is not searched again when it has already been
+    reached with a lower g-score, or with the same g-score during the current iteration.
+    :param order_children: If True, the children of every state are searched in order of increasing heuristic, so that
+    the most promising branches are tried first.
+    :return:
+    """
+    _check_arguments(start, is_goal, h, d)
+
+    if stats is None:
+        stats = SearchStats()
+
+    start_time = time.perf_counter()
+    expansions = 0
+
+    start.set_g_score(0)
+    start.set_h_score(h(start))
+    path = [start]
+
+    def lookup(key: Hashable) -> Optional[Tuple[float, float]]:
+        if transposition_table is None:
+            return None
+
+        stats.table_lookups += 1
+        entry = transposition_table.lookup(hash(key))
+        if entry is not None:
+            stats.table_hits += 1
+        return entry
+
+    def create_child(state: State, move: int, child_key: Hashable) -> State:
+        child = state.make_child(move, child_key)
+        child.set_g_score(state.get_g_score() + d(state, child))
+        child.set_h_score(h(child))
+        child.set_parent(state)
+        stats.generated_nodes += 1
+        return child
+
+    def search(state: State, bound: float, entry: Optional[Tuple[float, float]]) -> Optional[float]:
+        """
+        Depth first search that does not go past the bound.
+        :param entry: Transposition table entry of the state, looked up by its parent before the state was created.
+        :return: None if a goal was found (the path then ends with it), otherwise the lowest f-score that exceeded the
+        bound.
+        """
+        nonlocal expansions
+
+        g_score = state.get_g_score()
+        f_score = g_score + state.get_h_score()
+        if f_score > bound:
+            return f_score
+
+        if is_goal(state):
+            return None
+
+        if transposition_table is not None:
+            if entry is not None:
+                stored_g_score, stored_bound = entry
+                if stored_g_score < g_score or (stored_g_score == g_score and stored_bound == bound):
+                    return math.inf
+
+            if transposition_table.store(hash(state.get_key()), g_score, bound):
+                stats.table_collisions += 1
+
+        if max_expansions is not None and expansions >= max_expansions:
+            raise SearchFailure(f"Algorithm exceeded the limit of {max_expansions} expanded states.")
+
+        expansions += 1
+        stats.expanded_nodes += 1
+
+        # Children are only created up front when they have to be ordered. Otherwise the successors are walked lazily
+        # and a child object is only created once the transposition table lets it through.
+        if order_children:
+            children = [create_child(state, move, child_key) for move, child_key in state.get_successors()]
+            children.sort(key=lambda c: c.get_h_score())
+            successors = ((child.get_incoming_move(), child.get_key(), child) for child in children)
+        else:
+            successors = ((move, child_key, None) for move, child_key in state.get_successors())
+
+        minimum = math.inf
+        for move, child_key, child in successors:
+            child_entry = lookup(child_key)
+            # Costs are positive, so a state stored with at most the g-score of its parent has already been reached
+            # through a cheaper path.
+            if child_entry is not None and child_entry[0] <= g_score:
+                continue
+
+            if child is None:
+                child = create_child(state, move, child_key)
+
+            path.append(child)
+            stats.max_depth = max(stats.max_depth, len(path))
+            t = search(child, bound, child_entry)
+            if t is None:
+                return None
+
+            path.pop()
+            minimum = min(minimum, t)
+
+        return minimum
+
+    print("Solving...")
+    bound = start.get_h_score()
+    try:
+        while True:
+            t = search(start, bound, lookup(start.get_key()))
+            if t is None:
+                return path
+
+            if t == math.inf:
+                raise SearchFailure("Algorithm failed to find a solution.")
+
+            bound = t
+    finally:
+        stats.elapsed_time += time.perf_counter() - start_time
+
+
+# Anytime Repairing A* (ARA*) Algorithm
+def anytime_solve(start: State, is_goal: Callable, h: Callable, d: Callable, initial_weight: float = 2.0,
+                  weight_step: float = 0.5, time_limit: float = None,
+                  stats: SearchStats = None) -> Iterator[List[State]]:
+    """
+    Generator that quickly finds a first solution with a heavily weighted heuristic and then keeps improving it,
+    lowering the weight after every solution. States expanded with an earlier weight are not expanded again unless a
+    cheaper path to them is found, so each improvement reuses the work done before it.
+    :param start: Object of type State.
+    :param is_goal: Callable. A function that returns whether the current state is a final state or not.
+    :param h: Callable. A heuristic function that estimates the cost between current state and final state.
+    :param d: Callable. A function that returns the cost of the distance between parent and child states.
+    :param initial_weight: Weight of the heuristic for the first solution.
+    :param weight_step: Amount the weight is lowered by after each solution. The weight never drops below 1.
+    :param time_limit: Optional number of seconds after which no more improvements are searched for.
+    :param stats: Optional SearchStats object that gets filled in with the search counters.
+    :return: Yields every path that is cheaper than the previous one. The search ends after the weight 1 search, when
+    the time limit is reached or when the frontier runs out. If no solution has been found by then, an exception is
+    raised instead, so a search that timed out never ends silently.
+    """
+    _check_arguments(start, is_goal, h, d)
+
+    if initial_weight < 1:
+        raise Exception("'initial_weight' must be at least 1.")
+
+    if weight_step <= 0:
+        raise Exception("'weight_step' must be positive.")
+
+    if stats is None:
+        stats = SearchStats()
+
+    resume_time = time.perf_counter()
+    end_time = None if time_limit is None else resume_time + time_limit
+
+    weight = initial_weight
+    insertion_order = count()
+
+    # Best known instance of every state seen so far, as well as the frontier (open_set and heap) and the states
+    # expanded with the current weight, all keyed by state key. States whose g-score improves after they have been
+    # expanded are inconsistent: they wait in inconsistent_set until the next weight.
+    best_states = {}
+    open_set = {}
+    heap = []
+    closed_set = set()
+    inconsistent_set = {}
+
+    def priority(state: State) -> float:
+        return state.get_g_score() + weight * state.get_h_score()
+
+    def push(state: State) -> None:
+        heapq.heappush(heap, (priority(state), next(insertion_order), state))
+
+    start.set_g_score(0)
+    start.set_h_score(h(start))
+    best_states[start.get_key()] = start
+    open_set[start.get_key()] = start
+    push(start)
+    goal_state = start if is_goal(start) else None
+
+    def improve_path() -> bool:
+        """
+        Expands states until none of the frontier can lead to a path cheaper than the current solution.
+        :return: False if the time limit was reached first.
+        """
+        nonlocal goal_state
+
+        while heap:
+            f_score, _, current_state = heap[0]
+            current_key = current_state.get_key()
+            if open_set.get(current_key) is not current_state:
+                heapq.heappop(heap)
+                continue
+
+            if goal_state is not None and f_score >= goal_state.get_g_score():
+                return True
+
+            if end_time is not None and time.perf_counter() >= end_time:
+                return False
+
+            heapq.heappop(heap)
+            del open_set[current_key]
+            closed_set.add(current_key)
+            stats.expanded_nodes += 1
+
+            for move, child_key in current_state.get_successors():
+                known_child = best_states.get(child_key)
+                if known_child is not None:
+                    g_score = current_state.get_g_score() + d(current_state, known_child)
+                    if g_score >= known_child.get_g_score():
+                        continue
+                    child = current_state.make_child(move, child_key)
+                    child.set_h_score(known_child.get_h_score())
+                else:
+                    child = current_state.make_child(move, child_key)
+                    g_score = current_state.get_g_score() + d(current_state, child)
+                    child.set_h_score(h(child))
+
+                child.set_g_score(g_score)
                 child.set_parent(current_state)
-                open_set.add(child)
-                q.put(child)
+                best_states[child_key] = child
+                stats.generated_nodes += 1
+
+                if is_goal(child) and (goal_state is None or g_score < goal_state.get_g_score()):
+                    goal_state = child
+
+                if child_key in closed_set:
+                    inconsistent_set[child_key] = child
+                else:
+                    open_set[child_key] = child
+                    push(child)
+
+            stats.peak_frontier = max(stats.peak_frontier, len(open_set))
+
+        return True
+
+    print("Solving...")
+    last_goal_state = None
+    while True:
+        completed = improve_path()
+
+        if goal_state is not None and goal_state is not last_goal_state:
+            last_goal_state = goal_state
+            stats.elapsed_time += time.perf_counter() - resume_time
+            yield _reconstruct_path(goal_state)
+            resume_time = time.perf_counter()
+
+        if goal_state is None:
+            stats.elapsed_time += time.perf_counter() - resume_time
+            if not completed:
+                raise SearchFailure("Algorithm failed to find a solution within the time limit.")
+            raise SearchFailure("Algorithm failed to find a solution.")
+
+        if not completed or weight <= 1:
+            break
+
+        # Lower the weight, put the inconsistent states back on the frontier and order it by the new priorities.
+        weight = max(1.0, weight - weight_step)
+        open_set.update(inconsistent_set)
+        inconsistent_set.clear()
+        closed_set.clear()
+        heap = [(priority(state), next(insertion_order), state) for state in open_set.values()]
+        heapq.heapify(heap)
+
+    stats.elapsed_time += time.perf_counter() - resume_time
+
+
+def solve_optimal(start: State, is_goal: Callable, h: Callable, d: Callable, stats: SearchStats = None,
+                  max_expansions: int = None, consistency_samples: int = 1000) -> Tuple[List[State], float]:
+    """
+    Function that uses A* Algorithm to find a cheapest path to a solution. The heuristic has to be marked with
+    admissible, and its consistency is checked on sampled edges before the search starts. With such a heuristic, the
+    first goal taken from the frontier is reached through a cheapest path.
+    :param start: Object of type State.
+    :param is_goal: Callable. A function that returns whether the current state is a final state or not.
+    :param h: Callable. An admissible and consistent heuristic function.
+    :param d: Callable. A function that returns the cost of the distance between parent and child states.
+    :param stats: Optional SearchStats object that gets filled in with the search counters. If the search gives up,
+    its lower_bound is still a lower bound on the cost of any solution.
+    :param max_expansions: Optional upper bound on the number of expanded states.
+    :param consistency_samples: Number of edges the heuristic is checked on.
+    :return: The path and a lower bound on the cost of any solution, which equals the cost of the path.
+    """
+    _check_arguments(start, is_goal, h, d)
+
+    if not getattr(h, 'admissible', False):
+        raise Exception("'h' must be marked as admissible to find optimal solutions.")
+
+    if stats is None:
+        stats = SearchStats()
+
+    _check_consistency(start, is_goal, h, d, consistency_samples)
 
-    raise Exception("Algorithm failed to find a solution.")
+    path = solve(start, is_goal, h, d, stats, max_expansions, keep_parents=False)
+    return path, stats.lower_bound
@@ -0,0 +1,435 @@
+from operator import itemgetter
+from typing import List, Tuple, Callable, Iterator, Optional, Union
+from cube_io import parse_moves
+from rubiks_cube import CubeState, FRONT_FACE, BACK_FACE, RIGHT_FACE, LEFT_FACE, UPPER_FACE, DOWN_FACE, \
+    PACKED_OPERATIONS, INVERSE_OPERATIONS, all_cube_operations, cube_operation_indices
+from space_search import State, solve, SearchStats, SearchFailure
+
+SIDE_FACES = [FRONT_FACE, BACK_FACE, RIGHT_FACE, LEFT_FACE]
+
+# Default number of expanded states a single stage may use before it gives up.
+DEFAULT_MAX_EXPANSIONS = 200000
+
+# Expanded states the cross search may use before the cross is left to 3-cycles. Most crosses are found well within
+# this, the rest would take minutes.
+CROSS_MAX_EXPANSIONS = 5000
+
+
+class Stage:
+    """
+    One step of a staged solve. Each stage is a separate A* search with its own goal and heuristic, optionally
+    restricted to a subset of the cube operations.
+    """
+
+    def __init__(self, name: str, is_goal: Callable, h: Callable, operations: List[str] = None,
+                 max_expansions: int = DEFAULT_MAX_EXPANSIONS, weight: float = 1.0, fallback: 'Stage' = None):
+        """
+        :param name: Name used when reporting the stage.
+        :param is_goal: Callable. Receives a CubeState and returns whether the stage is complete.
+        :param h: Callable. Heuristic that receives a CubeState.
+        :param operations: Operations the search may apply. None allows all of them.
+        :param max_expansions: Upper bound on the number of states expanded by this stage's search.
+        :param weight: Weight of the heuristic, see space_search.solve.
+        :param fallback: Optional stage run from the same cube when this stage's search fails.
+        """
+        self.name = name
+        self.is_goal = is_goal
+        self.h = h
+        self.operations = operations
+        self.max_expansions = max_expansions
+        self.weight = weight
+        self.fallback = fallback
+
+    def get_start(self, cube: List) -> State:
+        """
+        :return: The state the search of the stage starts from.
+        """
+        return CubeState(cube, self.operations)
+
+    def get_operations(self, path: List[State]) -> List[str]:
+        """
+        :return: The cube operations along a path found by the search of the stage.
+        """
+        return [state.get_parent_operation() for state in path[1:]]
+
+
+class StageReport:
+    """
+    Outcome of a single stage: the operations it found and what the search cost.
+    """
+
+    def __init__(self, name: str, operations: List[str], stats: SearchStats, error: str = None):
+        """
+        :param error: Why the search of the stage failed. None if it succeeded.
+        """
+        self.name = name
+        self.operations = operations
+        self.stats = stats
+        self.error = error
+        self.elapsed_time = stats.elapsed_time
+        self.expanded_nodes = stats.expanded_nodes
+        self.generated_nodes = stats.generated_nodes
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def __str__(self) -> str:
+        if self.failed:
+            return f"{self.name}: failed after {self.expanded_nodes} expanded states, {self.elapsed_time:.3f}s " \
+                   f"({self.error})"
+        return f"{self.name}: {len(self.operations)} moves, {self.expanded_nodes} expanded states, " \
+               f"{self.elapsed_time:.3f}s"
+
+
+class StageFailure(Exception):
+    """
+    Raised by solve_in_stages when a stage and all of its fallbacks fail. Carries what was done up to that point.
+    """
+
+    def __init__(self, message: str, operations: List[str], reports: List[StageReport]):
+        """
+        :param operations: Operations of the stages that completed.
+        :param reports: Reports of every stage that ran, ending with the failed ones.
+        """
+        super().__init__(message)
+        self.operations = operations
+        self.reports = reports
+
+
+def _get_inverse(operations: List[str]) -> List[str]:
+    return [all_cube_operations[INVERSE_OPERATIONS[cube_operation_indices[operation]]]
+            for operation in reversed(operations)]
+
+
+def _get_commutator(a: List[str], b: List[str]) -> List[str]:
+    """
+    :return: The operations of a, then b, then the inverse of a and the inverse of b. Only the stickers moved by both a
+    and b can end up somewhere else.
+    """
+    return a + b + _get_inverse(a) + _get_inverse(b)
+
+
+# Commutators of commutators that move exactly 3 stickers, corner stickers 51, 52 and 53 and edge stickers 43, 45 and 46
+# of the packed state. Every other 3-cycle of stickers is one of these, conjugated by setup operations.
+BASE_CYCLES = [
+    _get_commutator(_get_commutator(parse_moves("D' R D"), parse_moves("L'")),
+                    _get_commutator(parse_moves("F'"), parse_moves("R' B' R"))),
+    _get_commutator(_get_commutator(parse_moves("B' R B"), parse_moves("U B U'")),
+                    _get_commutator(parse_moves("D L D'"), parse_moves("U F' U'"))),
+]
+
+
+def _get_permutation(operations: List[int]) -> Tuple[int, ...]:
+    """
+    :return: For every position of the packed state, the position its sticker comes from after the operations.
+    """
+    permutation = tuple(range(54))
+    for operation in operations:
+        permutation = PACKED_OPERATIONS[operation](permutation)
+    return permutation
+
+
+class _CycleTable:
+    """
+    Every 3-cycle of stickers that conjugating the base cycles with setup operations leads to. They are generated in
+    breadth first order, so each 3-cycle gets the shortest sequence of that form.
+    """
+
+    def __init__(self):
+        self.cycles = []  # (operation indices, permutation) of every 3-cycle
+        self.by_target = {}  # position -> (source, other, cycle index) of the cycles moving a sticker there
+        indices = {}
+        for base_cycle in BASE_CYCLES:
+            operations = tuple(cube_operation_indices[operation] for operation in base_cycle)
+            permutation = _get_permutation(operations)
+            if sum(1 for position in range(54) if permutation[position] != position) != 3:
+                raise Exception("A base cycle does not move exactly 3 stickers.")
+
+            indices[permutation] = len(self.cycles)
+            self.cycles.append((operations, permutation))
+
+        # Conjugating cycle c by operation m gives m' c m, which is again a 3-cycle. The loop also visits the cycles
+        # appended while it runs.
+        inverse_permutations = [_get_permutation([inverse]) for inverse in INVERSE_OPERATIONS]
+        for operations, permutation in self.cycles:
+            get_cycle = itemgetter(*permutation)
+            for move, inverse in enumerate(INVERSE_OPERATIONS):
+                conjugate = PACKED_OPERATIONS[move](get_cycle(inverse_permutations[move]))
+                if conjugate not in indices:
+                    indices[conjugate] = len(self.cycles)
+                    self.cycles.append(((inverse,) + operations + (move,), conjugate))
+
+        for index, (operations, permutation) in enumerate(self.cycles):
+            for target in range(54):
+                source = permutation[target]
+                if source != target:
+                    # The target receives the sticker of source, source the one of other and other the one of target.
+                    self.by_target.setdefault(target, []).append((source, permutation[source], index))
+
+        for candidates in self.by_target.values():
+            candidates.sort(key=lambda candidate: len(self.cycles[candidate[2]][0]))
+
+        self.getters = [itemgetter(*permutation) for _, permutation in self.cycles]
+        # The inverse of a 3-cycle is the same cycle in the other direction.
+        self.inverses = [indices[tuple(sorted(range(54), key=permutation.__getitem__))]
+                         for _, permutation in self.cycles]
+
+
+_cycle_table = None
+
+
+def _get_cycle_table() -> _CycleTable:
+    """
+    :return: The table of 3-cycles. It is built on first use.
+    """
+    global _cycle_table
+    if _cycle_table is None:
+        _cycle_table = _CycleTable()
+
+    return _cycle_table
+
+
+class CycleState(State):
+    """
+    Cube state whose children are reached through 3-cycles of stickers instead of single operations. The children are
+    the 3-cycles that bring the right color to the first misplaced sticker of the goal without moving any goal sticker
+    before it out of place, so every step places one more sticker and no step undoes an earlier one.
+    """
+
+    def __init__(self, key: bytes, stickers: Tuple[int, ...], targets: bytes, move: int = None):
+        """
+        :param key: Packed state, as returned by CubeState.get_key.
+        :param stickers: Positions of the goal stickers in the packed state, in the order they are placed.
+        :param targets: Color every position of the packed state should have.
+        :param move: Index of the 3-cycle that led to this state.
+        """
+        self._key = key
+        self._stickers = stickers
+        self._targets = targets
+        self._move = move
+        self._g_score = 0
+        self._h_score = 0
+        self._parent = None
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __eq__(self, other: 'CycleState') -> bool:
+        return self._key == other._key
+
+    def count_misplaced(self) -> int:
+        return sum(1 for position in self._stickers if self._key[position] != self._targets[position])
+
+    def get_children(self) -> List['CycleState']:
+        return [self.make_child(move, key) for move, key in self.get_successors()]
+
+    def get_successors(self) -> Iterator[Tuple[int, bytes]]:
+        key, targets = self._key, self._targets
+        placed = set()
+        for target in self._stickers:
+            if key[target] != targets[target]:
+                break
+            placed.add(target)
+        else:
+            return
+
+        table = _get_cycle_table()
+        for source, other, index in table.by_target[target]:
+            if key[source] != targets[target]:
+                continue
+            # source receives the sticker of other, other the one of target.
+            if source in placed and key[other] != targets[source]:
+                continue
+            if other in placed and key[target] != targets[other]:
+                continue
+
+            yield index, bytes(table.getters[index](key))
+
+    def make_child(self, move: int, key: bytes) -> 'CycleState':
+        return CycleState(key, self._stickers, self._targets, move)
+
+    def get_g_score(self) -> Union[float, int]:
+        return self._g_score
+
+    def get_h_score(self) -> Union[float, int]:
+        return self._h_score
+
+    def set_g_score(self, score: Union[float, int]) -> None:
+        self._g_score = score
+
+    def set_h_score(self, score: Union[float, int]) -> None:
+        self._h_score = score
+
+    def get_parent(self) -> 'CycleState':
+        return self._parent
+
+    def set_parent(self, state: 'CycleState') -> None:
+        self._parent = state
+
+    def get_key(self) -> bytes:
+        return self._key
+
+    def get_incoming_move(self) -> Optional[int]:
+        return self._move
+
+    def predecessor_key(self, key: bytes, move: int) -> bytes:
+        table = _get_cycle_table()
+        return bytes(table.getters[table.inverses[move]](key))
+
+    def from_key(self, key: bytes, move: Optional[int]) -> 'CycleState':
+        return CycleState(key, self._stickers, self._targets, move)
+
+    def get_cube(self) -> List:
+        return CubeState(None, key=self._key).get_cube()
+
+    def get_parent_operations(self) -> List[str]:
+        """
+        :return: The operations of the 3-cycle that was applied to the parent and led to this state.
+        """
+        if self._move is None:
+            return []
+        return [all_cube_operations[operation] for operation in _get_cycle_table().cycles[self._move][0]]
+
+
+class CycleStage(Stage):
+    """
+    Stage that places the goal stickers one at a time with 3-cycles. Each 3-cycle takes a few dozen operations, but a
+    cycle that places the next sticker always exists as long as the colors of the cube can be reached by rotations, so
+    the search never has to backtrack.
+    """
+
+    def __init__(self, name: str, stickers: List[Tuple[int, int, int]], max_expansions: int = DEFAULT_MAX_EXPANSIONS,
+                 weight: float = 2.0):
+        """
+        :param stickers: List of (face, row, column) positions, in the order they are placed.
+        """
+        self._stickers = tuple(_get_position(face, row, col) for face, row, col in stickers)
+
+        def misplaced(cycle_state: CycleState) -> int:
+            return cycle_state.count_misplaced()
+
+        def is_goal(cycle_state: CycleState) -> bool:
+            return cycle_state.count_misplaced() == 0
+
+        super().__init__(name, is_goal, misplaced, max_expansions=max_expansions, weight=weight)
+
+    def get_start(self, cube: List) -> State:
+        key = CubeState(cube).get_key()
+        # Every sticker belongs with the center of its face.
+        targets = bytes(key[_get_position(position % 6, 1, 1)] for position in range(54))
+        return CycleState(key, self._stickers, targets)
+
+    def get_operations(self, path: List[State]) -> List[str]:
+        # The setup operations that end one 3-cycle are often undone by the ones that start the next.
+        operations = []
+        for state in path[1:]:
+            for operation in state.get_parent_operations():
+                if operations and operations[-1] == _get_inverse([operation])[0]:
+                    operations.pop()
+                else:
+                    operations.append(operation)
+
+        return operations
+
+
+def _get_position(face: int, row: int, col: int) -> int:
+    """
+    :return: Position of the sticker in the packed state of a cube.
+    """
+    return (col * 3 + row) * 6 + face
+
+
+def sticker_stage(name: str, stickers: List[Tuple[int, int, int]], operations: List[str] = None,
+                  max_expansions: int = DEFAULT_MAX_EXPANSIONS, fallback: Stage = None) -> Stage:
+    """
+    Builds a stage whose goal is that every given sticker has the color of its face's center.
+    :param stickers: List of (face, row, column) positions.
+    :return: Stage whose heuristic is the number of stickers that are still out of place.
+    """
+
+    def misplaced(cube_state: CubeState) -> int:
+        cube = cube_state.get_cube()
+        return sum(1 for face, row, col in stickers if cube[face][row][col] != cube[face][1][1])
+
+    def is_goal(cube_state: CubeState) -> bool:
+        return misplaced(cube_state) == 0
+
+    return Stage(name, is_goal, misplaced, operations, max_expansions, fallback=fallback)
+
+
+def layer_by_layer_stages(max_expansions: int = DEFAULT_MAX_EXPANSIONS) -> List[Stage]:
+    """
+    Default pipeline that builds the cube from the upper face down: cross, first layer, middle layer, last layer.
+    Every stage keeps the stickers of the previous stages in its goal, so they are intact when the stage ends.
+
+    The cross is searched with single operations first. The rotations of RubiksCube do not keep the stickers of a piece
+    together, so the usual layer algorithms do not exist for them and a plain search runs out of expansions as soon as
+    most of the cube has to stay in place. The other layers, and a cross the search gives up on, are built with
+    3-cycles one sticker at a time instead.
+    """
+    # The upper and down rotations move the first and last rows of the side faces respectively, so row 0 of each side
+    # face belongs to the first layer and row 1 to the middle layer.
+    cross = [(UPPER_FACE, 0, 1), (UPPER_FACE, 1, 0), (UPPER_FACE, 1, 2), (UPPER_FACE, 2, 1)] + \
+            [(face, 0, 1) for face in SIDE_FACES]
+    first_layer = cross + [(UPPER_FACE, row, col) for row in [0, 2] for col in [0, 2]] + \
+                  [(face, 0, col) for face in SIDE_FACES for col in [0, 2]]
+    middle_layer = first_layer + [(face, 1, col) for face in SIDE_FACES for col in [0, 2]]
+    last_layer = middle_layer + [(DOWN_FACE, row, col) for row in range(3) for col in range(3)
+                                 if (row, col) != (1, 1)] + [(face, 2, col) for face in SIDE_FACES for col in range(3)]
+
+    return [sticker_stage("Cross", cross, max_expansions=min(max_expansions, CROSS_MAX_EXPANSIONS),
+                          fallback=CycleStage("Cross (3-cycles)", cross, max_expansions)),
+            CycleStage("First layer", first_layer, max_expansions),
+            CycleStage("Middle layer", middle_layer, max_expansions),
+            CycleStage("Last layer", last_layer, max_expansions)]
+
+
+def _run_stage(stage: Stage, cube: List, d: Callable) -> Tuple[StageReport, List]:
+    """
+    :return: The report of the stage and the cube it ended in, which is the cube it started from if it failed.
+    """
+    stats = SearchStats()
+    try:
+        path = solve(stage.get_start(cube), stage.is_goal, stage.h, d, stats, stage.max_expansions,
+                     weight=stage.weight)
+    except SearchFailure as e:
+        return StageReport(stage.name, [], stats, str(e)), cube
+
+    return StageReport(stage.name, stage.get_operations(path), stats), path[-1].get_cube()
+
+
+def solve_in_stages(cube: List, stages: List[Stage] = None, d: Callable = None) -> Tuple[List[str], List[StageReport]]:
+    """
+    Runs the stages one after the other, each one starting from the cube the previous stage ended in. A stage whose
+    search fails is followed by its fallback, if it has one.
+    :param cube: Cube to solve. It is not modified.
+    :param stages: Stages to run. Defaults to layer_by_layer_stages().
+    :param d: Callable. Cost between parent and child states. Defaults to 1 per step, which is one operation or one
+    3-cycle.
+    :return: The concatenated operations of all stages and a report for every stage that ran, failed ones included.
+    :raises StageFailure: If a stage and its fallbacks fail. It holds the operations and reports up to that point.
+    """
+    if stages is None:
+        stages = layer_by_layer_stages()
+
+    if d is None:
+        def d(parent, child):
+            return 1
+
+    operations = []
+    reports = []
+    for stage in stages:
+        while True:
+            report, cube = _run_stage(stage, cube, d)
+            reports.append(report)
+            if not report.failed or stage.fallback is None:
+                break
+            stage = stage.fallback
+
+        if report.failed:
+            raise StageFailure(f"Stage {report.name} failed: {report.error}", operations, reports)
+
+        operations.extend(report.operations)
+
+    return operations, reports
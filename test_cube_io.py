@@ -0,0 +1,158 @@
+import io
+import random
+import pytest
+from copy import deepcopy
+from cube_io import STATE_SIZE, MAGIC, encode_state, decode_state, encode_cube, decode_cube, find_invalid_states, \
+    write_states, read_states, parse_moves, format_moves, write_solutions, read_solutions
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, all_cube_operations
+
+
+def get_keys(count: int, seed: int = 0):
+    random.seed(seed)
+    return [CubeState(RubiksCube.give_me_cube(random.randint(0, 30))).get_key() for _ in range(count)]
+
+
+def get_file(keys, chunk_size: int = 4) -> io.BytesIO:
+    file = io.BytesIO()
+    write_states(file, keys, chunk_size)
+    file.seek(0)
+    return file
+
+
+def with_wrong_counts(data: bytes) -> bytes:
+    # Flips the lowest bit of the first sticker's color code, which changes its color.
+    return bytes([data[0] ^ 1]) + data[1:]
+
+
+def with_padding(data: bytes) -> bytes:
+    # The last byte of the first plane only holds 6 stickers, its top bit is padding.
+    return data[:6] + bytes([data[6] | 0x80]) + data[7:]
+
+
+def test_state_round_trip():
+    for key in get_keys(200):
+        data = encode_state(key)
+        assert len(data) == STATE_SIZE == 21
+        assert decode_state(data) == key
+
+
+def test_cube_round_trip():
+    cube = RubiksCube.give_me_cube(20)
+    assert decode_cube(encode_cube(cube)) == cube
+
+
+def test_encoding_is_unique():
+    keys = set(get_keys(200))
+    assert len(set(encode_state(key) for key in keys)) == len(keys)
+
+
+def test_invalid_states_are_found():
+    solved_key = CubeState(SOLVED_CUBE).get_key()
+    # A corner sticker and an edge sticker of different colors swapped.
+    swapped = bytearray(solved_key)
+    swapped[0], swapped[7] = swapped[7], swapped[0]
+    keys = [solved_key, bytes(swapped), solved_key[:-1], solved_key]
+    assert find_invalid_states(keys) == [2]
+    assert find_invalid_states([key for key in keys if len(key) == 54]) == [1]
+    with pytest.raises(Exception):
+        encode_state(bytes(swapped))
+
+
+def test_decode_rejects_wrong_counts_and_padding():
+    data = encode_state(get_keys(1)[0])
+    for invalid in [with_wrong_counts(data), with_padding(data), data[:-1]]:
+        with pytest.raises(Exception):
+            decode_state(invalid)
+
+
+@pytest.mark.parametrize('count', [0, 1, 3, 4, 5, 8, 13])
+def test_states_file_round_trip_across_chunks(count):
+    keys = get_keys(count)
+    file = get_file(keys, chunk_size=4)
+    assert len(file.getvalue()) == len(MAGIC) + count * STATE_SIZE
+
+    for chunk_size in [1, 3, 4, 5, 100]:
+        file.seek(0)
+        assert list(read_states(file, chunk_size)) == keys
+
+
+def test_write_states_rejects_invalid_state():
+    keys = get_keys(6)
+    keys[5] = keys[5][::-1]
+    with pytest.raises(Exception, match="State 5"):
+        write_states(io.BytesIO(), keys, chunk_size=4)
+
+
+@pytest.mark.parametrize('make_invalid', [with_wrong_counts, with_padding])
+def test_read_states_rejects_or_skips_invalid_states(make_invalid):
+    keys = get_keys(10)
+    data = get_file(keys).getvalue()
+    offset = len(MAGIC) + 6 * STATE_SIZE
+    data = data[:offset] + make_invalid(data[offset:offset + STATE_SIZE]) + data[offset + STATE_SIZE:]
+
+    with pytest.raises(Exception, match="State 6"):
+        list(read_states(io.BytesIO(data), chunk_size=4))
+
+    assert list(read_states(io.BytesIO(data), chunk_size=4, skip_invalid=True)) == keys[:6] + keys[7:]
+
+
+def test_read_states_rejects_truncated_and_foreign_files():
+    data = get_file(get_keys(5)).getvalue()
+    with pytest.raises(Exception, match="truncated"):
+        list(read_states(io.BytesIO(data[:-1]), chunk_size=2))
+
+    with pytest.raises(Exception):
+        list(read_states(io.BytesIO(b'XXXX' + data[len(MAGIC):])))
+
+
+def test_parse_moves():
+    assert parse_moves("R U' F2") == ['right_clockwise', 'up_counterclockwise', 'front_clockwise', 'front_clockwise']
+    assert parse_moves("") == []
+    for notation in ["X", "R3", "U''", "r"]:
+        with pytest.raises(Exception):
+            parse_moves(notation)
+
+
+def test_format_moves():
+    assert format_moves(['right_clockwise', 'up_counterclockwise']) == "R U'"
+    assert format_moves(['up_clockwise'] * 3) == "U2 U"
+    with pytest.raises(Exception):
+        format_moves(['up'])
+
+
+def apply(cube, operations):
+    for operation in operations:
+        getattr(RubiksCube, operation)(cube)
+    return cube
+
+
+def test_moves_round_trip():
+    for operation in all_cube_operations:
+        assert parse_moves(format_moves([operation])) == [operation]
+
+    random.seed(0)
+    operations = [random.choice(all_cube_operations) for _ in range(100)]
+    parsed = parse_moves(format_moves(operations))
+    assert apply(deepcopy(SOLVED_CUBE), parsed) == apply(deepcopy(SOLVED_CUBE), operations)
+
+
+def test_half_turn_round_trip_is_equivalent_but_not_identical():
+    operations = ['up_counterclockwise', 'up_counterclockwise']
+    assert format_moves(operations) == "U2"
+
+    parsed = parse_moves(format_moves(operations))
+    assert parsed == ['up_clockwise', 'up_clockwise']
+    assert parsed != operations
+
+    cube = RubiksCube.give_me_cube(10)
+    assert apply(deepcopy(cube), parsed) == apply(deepcopy(cube), operations)
+
+
+def test_solutions_file_round_trip():
+    solutions = [['right_clockwise', 'up_counterclockwise'], [], ['front_clockwise', 'front_clockwise']]
+    file = io.StringIO()
+    assert write_solutions(file, solutions) == 3
+    assert file.getvalue() == "R U'\n\nF2\n"
+
+    file.seek(0)
+    assert list(read_solutions(file)) == solutions
@@ -0,0 +1,39 @@
+import random
+import pytest
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, HEURISTIC_TABLE, HEURISTIC2_TABLE, HEURISTIC3_TABLE
+
+TABLES = [(HEURISTIC_TABLE, RubiksCube.heuristic), (HEURISTIC2_TABLE, RubiksCube.heuristic2),
+          (HEURISTIC3_TABLE, RubiksCube.heuristic3)]
+
+
+def get_scrambled_keys(count: int, seed: int):
+    random.seed(seed)
+    return [CubeState(RubiksCube.give_me_cube(random.randint(0, 50))).get_key() for _ in range(count)]
+
+
+def get_random_keys(count: int, seed: int):
+    # Any color on any sticker, centers included, so most of these states cannot be reached by rotations.
+    generator = random.Random(seed)
+    return [bytes(generator.randint(1, 6) for _ in range(54)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('table, heuristic', TABLES)
+def test_table_matches_heuristic_on_solved_cube(table, heuristic):
+    assert table(CubeState(SOLVED_CUBE).get_key()) == heuristic(SOLVED_CUBE)
+
+
+@pytest.mark.parametrize('table, heuristic', TABLES)
+def test_table_matches_heuristic_on_scrambled_cubes(table, heuristic):
+    for key in get_scrambled_keys(1000, seed=0):
+        assert table(key) == heuristic(CubeState(None, key=key).get_cube())
+
+
+@pytest.mark.parametrize('table, heuristic', TABLES)
+def test_table_matches_heuristic_on_random_stickers(table, heuristic):
+    for key in get_random_keys(1000, seed=1):
+        assert table(key) == heuristic(CubeState(None, key=key).get_cube())
+
+
+@pytest.mark.parametrize('table, heuristic', TABLES)
+def test_verify(table, heuristic):
+    assert table.verify(samples=200, seed=2)
@@ -0,0 +1,128 @@
+import random
+from collections import deque
+from copy import deepcopy
+import pytest
+from optimal_solver import get_solved_pattern_database, solve_cube_optimally
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, all_cube_operations
+from space_search import solve_optimal, admissible, SearchStats
+
+SOLVED_KEY = CubeState(SOLVED_CUBE).get_key()
+
+
+def get_distances(depth: int):
+    """
+    Breadth first search from the solved cube.
+    :return: Dict that maps every packed state up to the given depth to its number of operations from the solved cube.
+    """
+    distances = {SOLVED_KEY: 0}
+    queue = deque([SOLVED_KEY])
+    while queue:
+        key = queue.popleft()
+        if distances[key] == depth:
+            continue
+
+        for move in range(len(all_cube_operations)):
+            child_key = CubeState.apply_packed_operation(key, move)
+            if child_key not in distances:
+                distances[child_key] = distances[key] + 1
+                queue.append(child_key)
+
+    return distances
+
+
+DISTANCES = get_distances(5)
+
+
+def get_samples(count: int, seed: int = 0):
+    generator = random.Random(seed)
+    by_distance = {}
+    for key, distance in DISTANCES.items():
+        by_distance.setdefault(distance, []).append(key)
+
+    return [(key, distance) for distance in sorted(by_distance)
+            for key in generator.sample(sorted(by_distance[distance]), min(count, len(by_distance[distance])))]
+
+
+def is_solved(cube_state: CubeState) -> bool:
+    return cube_state.get_key() == SOLVED_KEY
+
+
+def d(parent, child):
+    return 1
+
+
+def test_pattern_database_is_admissible():
+    pattern_database = get_solved_pattern_database()
+    assert pattern_database(SOLVED_KEY) == 0
+    for key, distance in DISTANCES.items():
+        if distance <= 4:
+            assert pattern_database(key) <= distance
+
+
+def test_solved_cube():
+    operations, lower_bound = solve_cube_optimally(deepcopy(SOLVED_CUBE))
+    assert operations == []
+    assert lower_bound == 0
+
+
+SAMPLES = get_samples(4)
+SAMPLE_IDS = [f"{distance}-moves-{i}" for i, (_, distance) in enumerate(SAMPLES)]
+
+
+@pytest.mark.parametrize('key, distance', SAMPLES, ids=SAMPLE_IDS)
+def test_solution_length_matches_breadth_first_search(key, distance):
+    cube = CubeState(None, key=key).get_cube()
+    original = deepcopy(cube)
+
+    stats = SearchStats()
+    operations, lower_bound = solve_cube_optimally(cube, stats)
+    assert len(operations) == distance
+    assert lower_bound == distance
+    assert stats.lower_bound == distance
+    assert RubiksCube.verify_solution(cube, operations)
+    assert cube == original
+
+
+def test_lower_bound_holds_when_search_gives_up():
+    key, distance = get_samples(1, seed=1)[-1]
+    stats = SearchStats()
+    with pytest.raises(Exception):
+        solve_cube_optimally(CubeState(None, key=key).get_cube(), stats, max_expansions=1)
+    assert stats.lower_bound <= distance
+
+
+def test_heuristic_must_be_marked_admissible():
+    pattern_database = get_solved_pattern_database()
+
+    def heuristic(cube_state: CubeState) -> int:
+        return pattern_database(cube_state.get_key())
+
+    start = CubeState(RubiksCube.give_me_cube(3))
+    with pytest.raises(Exception, match="admissible"):
+        solve_optimal(start, is_solved, heuristic, d)
+
+
+def test_inconsistent_heuristic_is_rejected():
+    pattern_database = get_solved_pattern_database()
+
+    @admissible
+    def heuristic(cube_state: CubeState) -> int:
+        return 10 * pattern_database(cube_state.get_key())
+
+    random.seed(0)
+    start = CubeState(RubiksCube.give_me_cube(10))
+    with pytest.raises(Exception, match="consistent"):
+        solve_optimal(start, is_solved, heuristic, d)
+
+
+def test_lower_bound_is_not_carried_over_between_searches():
+    key, distance = get_samples(1)[-1]
+    stats = SearchStats()
+    _, lower_bound = solve_cube_optimally(CubeState(None, key=key).get_cube(), stats)
+    assert lower_bound == distance
+
+    cube = deepcopy(SOLVED_CUBE)
+    RubiksCube.right_clockwise(cube)
+    operations, lower_bound = solve_cube_optimally(cube, stats)
+    assert len(operations) == 1
+    assert lower_bound == stats.lower_bound == 1
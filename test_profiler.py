@@ -0,0 +1,55 @@
+from copy import deepcopy
+import pytest
+from profiler import get_corpus, profile_corpus, main
+from rubiks_cube import RubiksCube, SOLVED_CUBE
+
+# Long enough for the stack sampler to fire at a short interval, bounded so that each pass takes a fraction of a second.
+SCRAMBLE = "R U F' D2 L B' U R2 F'"
+
+
+@pytest.fixture(scope='module')
+def result():
+    return profile_corpus(get_corpus(SCRAMBLE), faces=1, max_expansions=500, interval=0.0001)
+
+
+def test_get_corpus():
+    solved_cube = deepcopy(SOLVED_CUBE)
+    cube, = get_corpus("R U")
+    assert SOLVED_CUBE == solved_cube
+
+    expected = deepcopy(SOLVED_CUBE)
+    RubiksCube.right_clockwise(expected)
+    RubiksCube.up_clockwise(expected)
+    assert cube == expected
+
+    assert get_corpus(seed=1, count=3) == get_corpus(seed=1, count=3)
+    assert len(get_corpus(count=3)) == 3
+
+
+def test_heap_snapshot_is_taken_at_peak_frontier(result):
+    snapshot, = result['heap']
+    stats, = result['stats']
+    assert snapshot.taken
+    assert snapshot.frontier == stats.peak_frontier > 0
+    assert snapshot.counts['CubeState'] >= stats.peak_frontier
+
+
+def test_collapsed_stacks(result, tmp_path):
+    path = tmp_path / 'profile.folded'
+    result['sampler'].write_collapsed(str(path))
+    lines = path.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert stack.split(';')[-1]
+
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == sum(result['sampler'].samples.values())
+    assert result['profile'].total_calls > 0
+
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / 'profile.folded'
+    main(['--scramble', SCRAMBLE, '--max-expansions', '500', '--interval', '0.0001', '--collapsed', str(path)])
+    assert path.read_text()
+    assert "Heap at frontier size" in capsys.readouterr().out
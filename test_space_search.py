@@ -0,0 +1,358 @@
+import random
+from copy import deepcopy
+import pytest
+from optimal_solver import get_solved_pattern_database
+from rubiks_cube import RubiksCube, CubeState, SOLVED_CUBE, HEURISTIC_TABLE, PACKED_OPERATIONS, INVERSE_OPERATIONS, \
+    all_cube_operations, cube_operation_indices
+from space_search import State, TranspositionTable, SearchStats, solve, ida_solve, anytime_solve
+
+
+def is_solved(cube_state: CubeState) -> bool:
+    return RubiksCube.count_solved_faces(cube_state.get_cube()) >= 1
+
+
+def heuristic(cube_state: CubeState) -> float:
+    return HEURISTIC_TABLE(cube_state.get_key())
+
+
+def d(parent, child):
+    return 1
+
+
+def get_cube(seed: int):
+    random.seed(seed)
+    return RubiksCube.give_me_cube(12)
+
+
+def test_table_store_and_lookup():
+    table = TranspositionTable(size=16)
+    assert len(table) == 16
+    assert table.lookup(5) is None
+
+    assert not table.store(5, 3, 7)
+    assert table.lookup(5) == (3, 7)
+
+    # Only a lower or equal g-score replaces the stored entry.
+    table.store(5, 4, 9)
+    assert table.lookup(5) == (3, 7)
+    table.store(5, 2, 8)
+    assert table.lookup(5) == (2, 8)
+
+
+def test_table_hash_zero():
+    table = TranspositionTable(size=16)
+    table.store(0, 1, 1)
+    assert table.lookup(0) == (1, 1)
+
+
+def test_table_probes_neighbouring_slots():
+    table = TranspositionTable(size=16, probes=3)
+    for state_hash in [1, 17, 33]:
+        assert not table.store(state_hash, state_hash, 0)
+
+    for state_hash in [1, 17, 33]:
+        assert table.lookup(state_hash) == (state_hash, 0)
+
+
+def test_table_evicts_deepest_entry():
+    table = TranspositionTable(size=16, probes=3)
+    table.store(1, 5, 0)
+    table.store(17, 9, 0)
+    table.store(33, 2, 0)
+
+    # All probed slots are taken, so the entry with the highest g-score makes room.
+    assert table.store(49, 4, 0)
+    assert table.lookup(17) is None
+    assert table.lookup(49) == (4, 0)
+    assert table.lookup(1) == (5, 0)
+    assert table.lookup(33) == (2, 0)
+
+
+def test_table_clear():
+    table = TranspositionTable(size=16)
+    table.store(3, 1, 1)
+    table.clear()
+    assert table.lookup(3) is None
+
+
+def test_table_rejects_invalid_size():
+    with pytest.raises(Exception):
+        TranspositionTable(size=0)
+    with pytest.raises(Exception):
+        TranspositionTable(probes=0)
+
+
+def test_solve_with_table_counts_hits():
+    hits = 0
+    for seed in range(4):
+        cube = get_cube(seed)
+        stats = SearchStats()
+        path = solve(CubeState(cube), is_solved, heuristic, d, stats)
+
+        # Without evictions the table plays the part of the closed set, so the search is the same.
+        table_stats = SearchStats()
+        table_path = solve(CubeState(cube), is_solved, heuristic, d, table_stats,
+                           transposition_table=TranspositionTable())
+        assert len(table_path) == len(path)
+        assert table_stats.expanded_nodes == stats.expanded_nodes
+        assert table_stats.table_hits <= table_stats.table_lookups
+        assert table_stats.table_collisions == 0
+        hits += table_stats.table_hits
+
+    assert hits > 0
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_small_table_collides_and_still_solves(seed):
+    stats = SearchStats()
+    path = solve(CubeState(get_cube(seed)), is_solved, heuristic, d, stats,
+                 transposition_table=TranspositionTable(size=256))
+    assert is_solved(path[-1])
+    assert stats.table_collisions > 0
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_ida_solve_with_table(seed):
+    cube = get_cube(seed)
+    path = ida_solve(CubeState(cube), is_solved, heuristic, d)
+
+    stats = SearchStats()
+    table_path = ida_solve(CubeState(cube), is_solved, heuristic, d, stats, transposition_table=TranspositionTable())
+    assert is_solved(table_path[-1])
+    assert len(table_path) == len(path)
+    assert stats.table_hits > 0
+    assert stats.table_hit_rate() == stats.table_hits / stats.table_lookups
+    assert stats.max_depth >= len(table_path)
+    assert stats.peak_frontier == 0
+
+
+def test_inverse_operations_undo_moves():
+    key = CubeState(get_cube(0)).get_key()
+    state = CubeState(None, key=key)
+    for move in range(len(all_cube_operations)):
+        child_key = CubeState.apply_packed_operation(key, move)
+        assert CubeState.apply_packed_operation(child_key, INVERSE_OPERATIONS[move]) == key
+        assert state.predecessor_key(child_key, move) == key
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_solve_without_parents(seed):
+    cube = get_cube(seed)
+    path = solve(CubeState(cube), is_solved, heuristic, d)
+    moves_path = solve(CubeState(cube), is_solved, heuristic, d, keep_parents=False)
+
+    assert [state.get_parent_operation() for state in moves_path[1:]] == \
+           [state.get_parent_operation() for state in path[1:]]
+    assert [state.get_g_score() for state in moves_path] == [state.get_g_score() for state in path]
+    assert [state.get_key() for state in moves_path] == [state.get_key() for state in path]
+    for parent, child in zip(moves_path, moves_path[1:]):
+        assert child.get_parent() is parent
+
+
+def test_solve_without_parents_rejects_table():
+    with pytest.raises(Exception):
+        solve(CubeState(get_cube(0)), is_solved, heuristic, d, keep_parents=False,
+              transposition_table=TranspositionTable())
+
+
+def test_packed_operations_match_cube_operations():
+    cube = get_cube(0)
+    key = CubeState(cube).get_key()
+    for move, operation in enumerate(all_cube_operations):
+        rotated = deepcopy(cube)
+        getattr(RubiksCube, operation)(rotated)
+        assert bytes(PACKED_OPERATIONS[move](key)) == CubeState.apply_packed_operation(key, move)
+        assert CubeState.apply_packed_operation(key, move) == CubeState(rotated).get_key()
+        assert CubeState(None, key=CubeState.apply_packed_operation(key, move)).get_cube() == rotated
+
+
+def test_successors_match_rotated_cubes():
+    state = CubeState(get_cube(1))
+    for move, child_key in state.get_successors():
+        rotated = deepcopy(state.get_cube())
+        getattr(RubiksCube, all_cube_operations[move])(rotated)
+        child = state.make_child(move, child_key)
+        assert child.get_key() == child_key == CubeState(rotated).get_key()
+        assert child.get_parent_operation() == all_cube_operations[move]
+
+
+def test_make_child_prohibits_third_turn():
+    move = cube_operation_indices['up_clockwise']
+    state = CubeState(get_cube(2))
+    child = state.make_child(move, CubeState.apply_packed_operation(state.get_key(), move))
+    assert move in [child_move for child_move, _ in child.get_successors()]
+    assert cube_operation_indices['up_counterclockwise'] not in [child_move for child_move, _ in child.get_successors()]
+
+    grandchild = child.make_child(move, CubeState.apply_packed_operation(child.get_key(), move))
+    assert move not in [grandchild_move for grandchild_move, _ in grandchild.get_successors()]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_ida_solve_order_children(seed):
+    cube = get_cube(seed)
+    path = ida_solve(CubeState(cube), is_solved, heuristic, d)
+
+    stats = SearchStats()
+    ordered_path = ida_solve(CubeState(cube), is_solved, heuristic, d, stats, order_children=True)
+    assert is_solved(ordered_path[-1])
+    assert len(ordered_path) == len(path)
+    for parent, child in zip(ordered_path, ordered_path[1:]):
+        assert child.get_parent() is parent
+
+
+def test_ida_solve_with_table_creates_fewer_children():
+    cube = get_cube(0)
+    stats = SearchStats()
+    ida_solve(CubeState(cube), is_solved, heuristic, d, stats)
+
+    table_stats = SearchStats()
+    ida_solve(CubeState(cube), is_solved, heuristic, d, table_stats, transposition_table=TranspositionTable())
+    # Children found in the table with a cheaper path are cut before they are created.
+    assert table_stats.generated_nodes < stats.generated_nodes
+    assert table_stats.generated_nodes < table_stats.table_lookups
+
+
+GRID_MOVES = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+GRID_SIZE = 30
+
+
+class GridState(State):
+    """
+    Cell of a grid with walls. Weighted searches often take a detour here, which the cube does not do on scrambles
+    short enough to be solved optimally in a test.
+    """
+
+    def __init__(self, cells, key, move=None):
+        self._cells = cells
+        self._key = key
+        self._move = move
+        self._g_score = 0
+        self._h_score = 0
+        self._parent = None
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        return self._key == other._key
+
+    def get_children(self):
+        return [self.make_child(move, key) for move, key in self.get_successors()]
+
+    def get_successors(self):
+        for move, (dx, dy) in enumerate(GRID_MOVES):
+            key = self._key[0] + dx, self._key[1] + dy
+            if key in self._cells:
+                yield move, key
+
+    def make_child(self, move, key):
+        return self.from_key(key, move)
+
+    def get_g_score(self):
+        return self._g_score
+
+    def get_h_score(self):
+        return self._h_score
+
+    def set_g_score(self, score):
+        self._g_score = score
+
+    def set_h_score(self, score):
+        self._h_score = score
+
+    def get_parent(self):
+        return self._parent
+
+    def set_parent(self, state):
+        self._parent = state
+
+    def get_key(self):
+        return self._key
+
+    def get_incoming_move(self):
+        return self._move
+
+    def predecessor_key(self, key, move):
+        return key[0] - GRID_MOVES[move][0], key[1] - GRID_MOVES[move][1]
+
+    def from_key(self, key, move):
+        return GridState(self._cells, key, move)
+
+
+GRID_GOAL = (GRID_SIZE - 1, GRID_SIZE - 1)
+
+
+def get_grid_start(seed: int) -> GridState:
+    generator = random.Random(seed)
+    cells = {(x, y) for x in range(GRID_SIZE) for y in range(GRID_SIZE) if generator.random() >= 0.3}
+    return GridState(cells | {(0, 0), GRID_GOAL}, (0, 0))
+
+
+def is_grid_goal(state: GridState) -> bool:
+    return state.get_key() == GRID_GOAL
+
+
+def grid_heuristic(state: GridState) -> int:
+    return abs(GRID_GOAL[0] - state.get_key()[0]) + abs(GRID_GOAL[1] - state.get_key()[1])
+
+
+def get_cost(path) -> int:
+    return sum(d(parent, child) for parent, child in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize('seed', [0, 3, 14])
+def test_anytime_solve_improves_to_optimal_cost(seed):
+    stats = SearchStats()
+    costs = [get_cost(path) for path in anytime_solve(get_grid_start(seed), is_grid_goal, grid_heuristic, d,
+                                                      initial_weight=3, weight_step=0.5, stats=stats)]
+    assert len(costs) > 1
+    assert all(cost > next_cost for cost, next_cost in zip(costs, costs[1:]))
+    assert costs[-1] == get_cost(solve(get_grid_start(seed), is_grid_goal, grid_heuristic, d))
+    assert stats.expanded_nodes > 0
+
+
+def test_anytime_solve_paths_replay():
+    pattern_database = get_solved_pattern_database()
+    solved_key = CubeState(SOLVED_CUBE).get_key()
+
+    def is_cube_solved(cube_state: CubeState) -> bool:
+        return cube_state.get_key() == solved_key
+
+    def cube_heuristic(cube_state: CubeState) -> int:
+        return pattern_database(cube_state.get_key())
+
+    for seed in range(4):
+        random.seed(seed)
+        cube = RubiksCube.give_me_cube(8)
+        paths = list(anytime_solve(CubeState(cube), is_cube_solved, cube_heuristic, d, initial_weight=3))
+        assert paths
+        for path in paths:
+            assert RubiksCube.verify_solution(cube, [state.get_parent_operation() for state in path[1:]])
+
+
+def test_anytime_solve_time_limit():
+    with pytest.raises(Exception, match="time limit"):
+        next(anytime_solve(get_grid_start(0), is_grid_goal, grid_heuristic, d, time_limit=0))
+
+    goal = get_grid_start(0).from_key(GRID_GOAL, None)
+    assert [path[-1].get_key() for path in anytime_solve(goal, is_grid_goal, grid_heuristic, d, time_limit=0)] == \
+           [GRID_GOAL]
+
+
+def test_anytime_solve_rejects_invalid_weights():
+    with pytest.raises(Exception):
+        next(anytime_solve(get_grid_start(0), is_grid_goal, grid_heuristic, d, initial_weight=0.5))
+    for weight_step in [0, -1]:
+        with pytest.raises(Exception):
+            next(anytime_solve(get_grid_start(0), is_grid_goal, grid_heuristic, d, weight_step=weight_step))
+
+
+@pytest.mark.parametrize('seed', [0, 3, 14])
+def test_weighted_solve_is_bounded(seed):
+    cost = get_cost(solve(get_grid_start(seed), is_grid_goal, grid_heuristic, d))
+    for weight in [1.5, 3]:
+        weighted_cost = get_cost(solve(get_grid_start(seed), is_grid_goal, grid_heuristic, d, weight=weight))
+        assert cost <= weighted_cost <= weight * cost
+
+    with pytest.raises(Exception):
+        solve(get_grid_start(seed), is_grid_goal, grid_heuristic, d, weight=0.5)
@@ -0,0 +1,99 @@
+import random
+from copy import deepcopy
+import pytest
+from rubiks_cube import RubiksCube, UPPER_FACE, all_cube_operations
+from staged_solver import DEFAULT_MAX_EXPANSIONS, Stage, CycleStage, StageFailure, sticker_stage, \
+    layer_by_layer_stages, solve_in_stages, _get_cycle_table, _get_permutation
+
+UPPER_STICKERS = [(UPPER_FACE, row, col) for row in range(3) for col in range(3) if (row, col) != (1, 1)]
+
+
+def get_cube(seed: int, rotations: int = 18):
+    random.seed(seed)
+    return RubiksCube.give_me_cube(rotations)
+
+
+def test_cycle_table():
+    table = _get_cycle_table()
+    # Every orientation of every 3 positions of the corner and edge orbits.
+    assert len(table.cycles) == 2 * 2 * 24 * 23 * 22 // 6
+
+    generator = random.Random(0)
+    for index in generator.sample(range(len(table.cycles)), 200):
+        operations, permutation = table.cycles[index]
+        assert _get_permutation(operations) == permutation
+        assert sum(1 for position in range(54) if permutation[position] != position) == 3
+
+        inverse = table.cycles[table.inverses[index]][1]
+        assert tuple(permutation[i] for i in inverse) == tuple(range(54))
+
+
+@pytest.mark.parametrize('seed, rotations', [(seed, 18) for seed in range(5)] + [(5, 100)])
+def test_default_pipeline_solves_cube(seed, rotations):
+    cube = get_cube(seed, rotations)
+    original = deepcopy(cube)
+
+    stages = layer_by_layer_stages(DEFAULT_MAX_EXPANSIONS)
+    budgets = {stage.name: stage.max_expansions for stage in stages + [stages[0].fallback]}
+
+    operations, reports = solve_in_stages(cube, stages)
+    assert RubiksCube.verify_solution(cube, operations)
+    assert cube == original
+    assert all(operation in all_cube_operations for operation in operations)
+    assert [report.name for report in reports if not report.failed][-3:] == ["First layer", "Middle layer",
+                                                                               "Last layer"]
+    assert sum(len(report.operations) for report in reports) >= len(operations)
+    for report in reports:
+        assert report.expanded_nodes <= budgets[report.name]
+
+
+def test_default_pipeline_reports_cross_search():
+    for seed in range(5):
+        _, reports = solve_in_stages(get_cube(seed))
+        assert reports[0].name == "Cross"
+        assert reports[0].expanded_nodes > 0
+        if reports[0].failed:
+            assert reports[1].name == "Cross (3-cycles)"
+            assert reports[0].operations == []
+
+
+def test_failed_search_falls_back():
+    cube = get_cube(0)
+    stages = [sticker_stage("Upper face", UPPER_STICKERS, max_expansions=1,
+                            fallback=CycleStage("Upper face (3-cycles)", UPPER_STICKERS))]
+
+    operations, reports = solve_in_stages(cube, stages)
+    assert [report.failed for report in reports] == [True, False]
+    assert reports[0].stats.expanded_nodes == 1
+    assert reports[1].operations == operations
+    assert RubiksCube.verify_solution(cube, operations, lambda c: len(set(sum(c[UPPER_FACE], []))) == 1)
+
+
+def test_failure_keeps_partial_reports():
+    cube = get_cube(1)
+    stages = [CycleStage("Upper face", UPPER_STICKERS), sticker_stage("Everything", UPPER_STICKERS + [
+        (face, row, col) for face in range(4) for row in range(3) for col in range(3)], max_expansions=10)]
+
+    with pytest.raises(StageFailure) as e:
+        solve_in_stages(cube, stages)
+
+    reports = e.value.reports
+    assert [report.name for report in reports] == ["Upper face", "Everything"]
+    assert not reports[0].failed
+    assert reports[1].failed
+    assert reports[1].stats.expanded_nodes == 10
+    assert "Everything" in str(e.value)
+    assert e.value.operations == reports[0].operations
+
+
+def test_errors_in_a_stage_are_not_reported_as_failures():
+    def h(cube_state):
+        raise TypeError("Broken heuristic.")
+
+    stages = [Stage("Broken", lambda cube_state: False, h, fallback=CycleStage("Upper face", UPPER_STICKERS))]
+    with pytest.raises(TypeError):
+        solve_in_stages(get_cube(0), stages)
+
+    with pytest.raises(Exception) as e:
+        solve_in_stages(get_cube(0), [sticker_stage("Upper face", UPPER_STICKERS, operations=['up'])])
+    assert not isinstance(e.value, StageFailure)